@@ -0,0 +1,450 @@
+"""
+Benchmark every script against locally generated corpora.
+
+Corpora are built reproducibly (fixed random seed) at small, medium or
+large scale and cached, so only the first run pays for generating them.
+Each script is run as a separate process, exactly as from the Terminal,
+and its wall time, throughput and peak memory are compared with a stored
+baseline.
+
+    python3 benchmark.py --scale small --save-baseline   # record a baseline
+    python3 benchmark.py --scale small                   # compare against it
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import instrument
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED = 20240501
+DEFAULT_BASELINE = os.path.join(HERE, 'benchmark_baseline.json')
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'office-tools-bench')
+
+SCALES = {
+    'small': dict(html_pages=20, html_kb=200, big_html_mb=2, md_files=200, dup_md_mb=5,
+                  docx_files=20, docx_paras=200, pdf_pages=10, tiff_frames=10, images=10,
+                  mime_files=2, mime_images=50),
+    'medium': dict(html_pages=100, html_kb=1000, big_html_mb=20, md_files=2000, dup_md_mb=200,
+                   docx_files=100, docx_paras=500, pdf_pages=50, tiff_frames=50, images=40,
+                   mime_files=4, mime_images=500),
+    'large': dict(html_pages=200, html_kb=5000, big_html_mb=300, md_files=10000, dup_md_mb=2048,
+                  docx_files=500, docx_paras=1000, pdf_pages=200, tiff_frames=200, images=100,
+                  mime_files=8, mime_images=1500),
+}
+
+WORDS = ("project budget review quarterly roadmap meeting notes action owner deadline customer "
+         "release design draft policy summary update team goal risk status metric launch plan "
+         "contract invoice agenda report vendor onboarding training feedback priority scope").split()
+
+# ---------------------------------------------------------------------------
+# Corpus generators. Each creates one folder or file under the scale's corpus dir.
+
+def words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+def title(rng):
+    return words(rng, rng.randint(2, 5)).title()
+
+def html_section(rng, i):
+    items = ''.join(
+        f'<li class="item" data-id="{i}-{k}"><span>{words(rng, 6)}</span>'
+        + (f'<ul><li aria-level="2">{words(rng, 4)}</li><li>{words(rng, 4)}</li></ul>' if k % 3 == 0 else '')
+        + '</li>' for k in range(rng.randint(3, 8)))
+    rows = ''.join(f'<tr><td style="padding:2px">{words(rng, 2)}</td><td>{rng.randint(1, 999)}</td></tr>'
+                   for _ in range(3))
+    return (f'<section id="s{i}" class="block"><h2 data-anchor="{i}">{title(rng)}</h2>'
+            f'<p class="lead" style="color:#333"><span>{words(rng, 40)}</span> <b>{words(rng, 5)}</b></p>'
+            f'<svg width="10" height="10"><circle r="4"/></svg><ul>{items}</ul>'
+            f'<table><tr><th>Name</th><th>Value</th></tr>{rows}</table></section>\n')
+
+def write_html(path, rng, size):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><head><title>Export</title><style>.block{margin:0}</style></head><body>\n')
+        written, i = 0, 0
+        while written < size:
+            written += f.write(html_section(rng, i))
+            i += 1
+        f.write('</body></html>\n')
+
+def gen_html(root, spec, rng):
+    os.makedirs(os.path.join(root, 'html'))
+    for i in range(spec['html_pages']):
+        write_html(os.path.join(root, 'html', f'page_{i:04d}.html'), rng, spec['html_kb'] * 1024)
+
+def gen_big_html(root, spec, rng):
+    os.makedirs(os.path.join(root, 'big'))
+    write_html(os.path.join(root, 'big', 'page.html'), rng, spec['big_html_mb'] * 1024 * 1024)
+
+def gen_md(root, spec, rng):
+    pages = os.path.join(root, 'md', 'pages')
+    os.makedirs(pages)
+    titles = []
+    seen = set()
+    while len(titles) < spec['md_files']:
+        name = f"{title(rng)} {len(titles)}"
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            titles.append(name)
+    for name in titles:
+        with open(os.path.join(pages, f'{name}.md'), 'w', encoding='utf-8') as f:
+            for _ in range(rng.randint(2, 6)):
+                f.write(f"## {title(rng)}\n\n{words(rng, rng.randint(30, 120))}\n\n")
+    # ToC as copied from Confluence: two levels, a few typos and a few files left out (orphans)
+    with open(os.path.join(root, 'md', 'toc.md'), 'w', encoding='utf-8') as f:
+        for i, name in enumerate(titles):
+            if rng.random() < 0.05:
+                continue
+            if rng.random() < 0.1:
+                pos = rng.randrange(len(name))
+                name = name[:pos] + name[pos + 1:]
+            f.write(('  ' if i % 4 else '') + f"- {name} More actions\n")
+
+def gen_dup_md(root, spec, rng):
+    pool = []
+    for i in range(2000):
+        body = words(rng, rng.randint(40, 200))
+        pool.append(f"## {title(rng)}\n\n{body}\n\n")
+        # Some near-duplicates: the same section with a date appended
+        if i % 10 == 0:
+            pool.append(f"## {title(rng)}\n\n{body} Updated {rng.randint(1, 28)}/05.\n\n")
+    target = spec['dup_md_mb'] * 1024 * 1024
+    with open(os.path.join(root, 'dup.md'), 'w', encoding='utf-8') as f:
+        f.write("# Combined export\n\nIntro text before the first section.\n\n")
+        written = 0
+        while written < target:
+            written += f.write(rng.choice(pool))
+
+def gen_docx(root, spec, rng):
+    from docx import Document
+    folder = os.path.join(root, 'docx')
+    os.makedirs(folder)
+    for i in range(spec['docx_files']):
+        doc = Document()
+        doc.add_heading(title(rng), 1)
+        for k in range(spec['docx_paras']):
+            kind = k % 10
+            if kind == 0:
+                doc.add_heading(title(rng), 2)
+            elif kind in (1, 2, 3):
+                doc.add_paragraph(words(rng, 8), style='List Bullet')
+            elif kind == 4 and k % 50 == 4:
+                table = doc.add_table(rows=3, cols=3)
+                for cell in table._cells:
+                    cell.text = words(rng, 2)
+            else:
+                para = doc.add_paragraph(words(rng, 25) + ' ')
+                para.add_run(words(rng, 3)).bold = True
+        doc.save(os.path.join(folder, f'doc_{i:04d}.docx'))
+
+def gen_mime(root, spec, rng):
+    """Word/Confluence-style "Single File Web Page" exports: one HTML part, many base64 images."""
+    import base64
+    import quopri
+    folder = os.path.join(root, 'mime')
+    os.makedirs(folder)
+    for i in range(spec['mime_files']):
+        boundary = f'----=_NextPart_{i:04d}.{rng.getrandbits(32):08X}'
+        body = []
+        for k in range(spec['mime_images']):
+            body.append(f'<h2>{title(rng)}</h2><p>{words(rng, 60)}</p>')
+            # Word refers to images by relative Content-Location, Confluence by cid:
+            src = f'page_files/image{k:04d}.png' if k % 2 else f'cid:image{k:04d}@{i}'
+            body.append(f'<p><img src="{src}" alt="figure {k}"></p>')
+        html = f'<html><head><title>Export {i}</title></head><body>{"".join(body)}</body></html>'
+        with open(os.path.join(folder, f'export_{i:02d}.doc'), 'wb') as f:
+            f.write(f'MIME-Version: 1.0\r\nContent-Type: multipart/related; boundary="{boundary}"\r\n\r\n'
+                    'This document is a Single File Web Page, also known as a Web Archive file.\r\n'.encode())
+            f.write(f'\r\n--{boundary}\r\nContent-Location: file:///C:/export/page.htm\r\n'
+                    'Content-Transfer-Encoding: quoted-printable\r\nContent-Type: text/html; charset="utf-8"\r\n\r\n'
+                    .encode())
+            f.write(quopri.encodestring(html.encode()).replace(b'\n', b'\r\n'))
+            for k in range(spec['mime_images']):
+                # Random bytes: already-compressed images look like noise too
+                image = base64.encodebytes(rng.randbytes(rng.randint(50_000, 150_000))).replace(b'\n', b'\r\n')
+                f.write(f'\r\n--{boundary}\r\nContent-Location: file:///C:/export/page_files/image{k:04d}.png\r\n'
+                        f'Content-ID: <image{k:04d}@{i}>\r\nContent-Transfer-Encoding: base64\r\n'
+                        'Content-Type: image/png\r\n\r\n'.encode())
+                f.write(image)
+            f.write(f'\r\n--{boundary}--\r\n'.encode())
+
+def gen_pdf(root, spec, rng):
+    import fitz
+    doc = fitz.open()
+    for i in range(spec['pdf_pages']):
+        page = doc.new_page()  # A4-ish default
+        page.insert_text((72, 72), f"Page {i + 1}: {title(rng)}", fontsize=18)
+        for line in range(40):
+            page.insert_text((72, 100 + line * 16), words(rng, 12), fontsize=10)
+        for _ in range(5):
+            x, y = rng.uniform(50, 450), rng.uniform(100, 700)
+            page.draw_rect(fitz.Rect(x, y, x + 80, y + 40), color=(0, 0, 1), fill=(0.8, 0.9, 1))
+    doc.save(os.path.join(root, 'doc.pdf'))
+
+def gen_tiff(root, spec, rng):
+    from PIL import Image, ImageDraw
+    frames = []
+    for i in range(spec['tiff_frames']):
+        im = Image.new('1', (1700, 2200), 1)  # letter page at 200 DPI, like a fax scan
+        draw = ImageDraw.Draw(im)
+        draw.text((100, 100), f"Page {i + 1}", fill=0)
+        for line in range(60):
+            draw.text((100, 160 + line * 32), words(rng, 14), fill=0)
+        frames.append(im)
+    frames[0].save(os.path.join(root, 'frames.tif'), save_all=True, append_images=frames[1:],
+                   compression='group4')
+
+def gen_images(root, spec, rng):
+    from PIL import Image, ImageDraw
+    folder = os.path.join(root, 'images')
+    os.makedirs(folder)
+    for i in range(spec['images']):
+        im = Image.new('RGB', (4000, 3000), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(im)
+        for _ in range(200):
+            x, y = rng.randrange(4000), rng.randrange(3000)
+            draw.ellipse((x, y, x + rng.randint(20, 400), y + rng.randint(20, 400)),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        im.save(os.path.join(folder, f'photo_{i:03d}.jpg'), quality=95)
+
+# corpus name -> (generator, what it creates under the corpus dir)
+GENERATORS = {
+    'html': (gen_html, 'html'),
+    'big_html': (gen_big_html, 'big'),
+    'md': (gen_md, 'md'),
+    'dup_md': (gen_dup_md, 'dup.md'),
+    'docx': (gen_docx, 'docx'),
+    'mime': (gen_mime, 'mime'),
+    'pdf': (gen_pdf, 'doc.pdf'),
+    'tiff': (gen_tiff, 'frames.tif'),
+    'images': (gen_images, 'images'),
+}
+
+# ---------------------------------------------------------------------------
+# Benchmarks. {c} is the corpus dir and {w} a scratch dir emptied after each run.
+# inputs is a glob (or list of globs) whose files count as the bytes (and, unless items names a
+# scale setting, the items) processed; cleanup removes outputs written into the corpus. warmup is
+# run untimed first. Scripts run without the conversion cache unless given --cache-dir.
+
+BENCHMARKS = [
+    dict(name='clean_html', corpus=['html'], args=['clean_html.py', '{c}/html', '--force'],
+         inputs='{c}/html/page_????.html', cleanup='{c}/html/*_cleaned.html'),
+    dict(name='html2md', corpus=['big_html'], args=['html2md.py', '{c}/big/page.html'],
+         inputs='{c}/big/page.html', items='big_html_mb', cleanup='{c}/big/page.md'),
+    dict(name='html2md --stream', corpus=['big_html'], args=['html2md.py', '--stream', '{c}/big/page.html'],
+         inputs='{c}/big/page.html', items='big_html_mb', cleanup='{c}/big/page.md'),
+    dict(name='combine_by_toc', corpus=['md'],
+         args=['combine_by_toc.py', '{c}/md/toc.md', '{c}/md/pages', '-o', '{w}/combined.md', '--full'],
+         inputs='{c}/md/pages/*.md'),
+    dict(name='combine_md', corpus=['md'], args=['combine_md.py', '{c}/md/pages', '-o', '{w}/combined.md'],
+         inputs='{c}/md/pages/*.md'),
+    dict(name='deduplicate_md', corpus=['dup_md'], args=['deduplicate_md.py', '{c}/dup.md', '{w}/out.md'],
+         inputs='{c}/dup.md', items='dup_md_mb'),
+    dict(name='deduplicate_md --near', corpus=['dup_md'],
+         args=['deduplicate_md.py', '{c}/dup.md', '{w}/out.md', '--near', '0.8'],
+         inputs='{c}/dup.md', items='dup_md_mb'),
+    dict(name='section_index', corpus=['md'],
+         args=['section_index.py', 'update', '{c}/md/pages', '--index', '{w}/index.sqlite'],
+         inputs='{c}/md/pages/*.md'),
+    dict(name='section_index report', corpus=['md'],
+         warmup=['section_index.py', 'update', '{c}/md/pages', '--index', '{w}/index.sqlite'],
+         args=['section_index.py', 'report', '{c}/md/pages', '--index', '{w}/index.sqlite'],
+         inputs='{c}/md/pages/*.md'),
+    dict(name='docx2md', corpus=['docx'], args=['docx2md.py', '{c}/docx', '{w}', '--force'],
+         inputs='{c}/docx/*.docx'),
+    dict(name='docx2md (cached)', corpus=['docx'],
+         warmup=['docx2md.py', '{c}/docx', '{w}/first', '--cache-dir', '{w}/convert-cache'],
+         args=['docx2md.py', '{c}/docx', '{w}/second', '--cache-dir', '{w}/convert-cache'],
+         inputs='{c}/docx/*.docx'),
+    dict(name='docx2md (MIME)', corpus=['mime'], args=['docx2md.py', '{c}/mime', '{w}', '--force'],
+         inputs='{c}/mime/*.doc'),
+    dict(name='docx2md (MIME) --assets', corpus=['mime'],
+         args=['docx2md.py', '{c}/mime', '{w}', '--force', '--assets'], inputs='{c}/mime/*.doc'),
+    dict(name='pipeline', corpus=['docx', 'html'], args=['pipeline.py', '{c}/docx', '{c}/html', '-o', '{w}'],
+         inputs=['{c}/docx/*.docx', '{c}/html/page_????.html'], cleanup='{c}/html/*_cleaned.html'),
+    dict(name='pdf_to_png_nomadmin', corpus=['pdf'],
+         args=['pdf_to_png_nomadmin.py', '{c}/doc.pdf', '-o', '{w}', '--dpi', '150'],
+         inputs='{c}/doc.pdf', items='pdf_pages'),
+    dict(name='pdf_to_png_nomadmin (cached)', corpus=['pdf'],
+         warmup=['pdf_to_png_nomadmin.py', '{c}/doc.pdf', '-o', '{w}/first', '--dpi', '150',
+                 '--cache-dir', '{w}/convert-cache'],
+         args=['pdf_to_png_nomadmin.py', '{c}/doc.pdf', '-o', '{w}/second', '--dpi', '150',
+               '--cache-dir', '{w}/convert-cache'],
+         inputs='{c}/doc.pdf', items='pdf_pages'),
+    dict(name='extract_pages', corpus=['tiff'], args=['extract_pages.py', '{c}/frames.tif', '-o', '{w}'],
+         inputs='{c}/frames.tif', items='tiff_frames'),
+    dict(name='images_to_pptx', corpus=['images'],
+         args=['images_to_pptx.py', '{c}/images', '{w}/deck.pptx', '--optimize', '--cache-dir', '{w}/cache'],
+         inputs='{c}/images/*.jpg'),
+    dict(name='pdf_to_pptx', corpus=['pdf'], args=['pdf_to_pptx.py', '{c}/doc.pdf', '{w}/deck.pptx'],
+         inputs='{c}/doc.pdf', items='pdf_pages'),
+]
+
+def ensure_corpus(corpus_dir, scale, names, regenerate=False):
+    """Generate the named corpora for scale unless a finished copy is cached."""
+    root = os.path.join(corpus_dir, scale)
+    os.makedirs(root, exist_ok=True)
+    for name in names:
+        marker = os.path.join(root, f'.{name}.done')
+        if os.path.exists(marker) and not regenerate:
+            continue
+        output = GENERATORS[name][1]
+        # Clear out anything left by an interrupted or older generation
+        path = os.path.join(root, output)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        start = time.perf_counter()
+        print(f"Generating {scale} corpus '{name}'...", flush=True)
+        # In a child process: on Linux a child's peak RSS starts at its parent's,
+        # so this process must stay small for the measurements to mean anything
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--generate', name,
+                        '--scale', scale, '--corpus-dir', corpus_dir], check=True)
+        with open(marker, 'w') as f:
+            f.write(f"{time.perf_counter() - start:.1f}\n")
+    return root
+
+def generate(corpus_dir, scale, name):
+    # One seed per corpus, so each is reproducible whatever else is generated
+    GENERATORS[name][0](os.path.join(corpus_dir, scale), SCALES[scale], random.Random(f"{SEED}-{scale}-{name}"))
+
+def run_once(bench, root, spec):
+    """Run one benchmark in a fresh process; returns its measurements."""
+    work = tempfile.mkdtemp(prefix='bench-')
+    fill = lambda s: s.format(c=root, w=work)
+    patterns = bench['inputs'] if isinstance(bench['inputs'], list) else [bench['inputs']]
+    inputs = [p for pattern in patterns for p in glob.glob(fill(pattern))]
+    size = sum(os.path.getsize(p) for p in inputs)
+    items = spec[bench['items']] if bench.get('items') else len(inputs)
+    args = [sys.executable, os.path.join(HERE, bench['args'][0])] + [fill(a) for a in bench['args'][1:]]
+    log_path = os.path.join(work, 'output.log')
+    # Only the benchmarks that pass --cache-dir see a conversion cache, whatever the caller's setting
+    env = dict(os.environ, OFFICE_TOOLS_CACHE='off')
+    try:
+        if bench.get('warmup'):
+            with open(log_path, 'w') as log:
+                subprocess.run([sys.executable, os.path.join(HERE, bench['warmup'][0])]
+                               + [fill(a) for a in bench['warmup'][1:]],
+                               stdout=log, stderr=subprocess.STDOUT, cwd=work, env=env, check=True)
+        with open(log_path, 'w') as log:
+            start = time.perf_counter()
+            proc = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, cwd=work, env=env)
+            if hasattr(os, 'wait4'):
+                # wait4 reports the peak RSS of this child (and the pool workers it reaped)
+                _, status, rusage = os.wait4(proc.pid, 0)
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                rss = instrument.maxrss_mb(rusage)
+            else:
+                proc.wait()
+                rss = None
+            wall = time.perf_counter() - start
+        if proc.returncode:
+            with open(log_path) as log:
+                tail = log.read()[-2000:]
+            raise RuntimeError(f"{bench['name']} exited with {proc.returncode}:\n{tail}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        if bench.get('cleanup'):
+            for path in glob.glob(fill(bench['cleanup'])):
+                os.remove(path)
+    return {
+        'wall_s': round(wall, 3),
+        'mb_per_s': round(size / 1e6 / wall, 2) if wall else None,
+        'items_per_s': round(items / wall, 2) if wall else None,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None,
+        'input_mb': round(size / 1e6, 2),
+        'items': items,
+    }
+
+def change(new, old):
+    if not new or not old:
+        return None
+    return (new - old) / old
+
+def fmt_change(value):
+    return '' if value is None else f"{value:+.0%}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the office tools on generated corpora.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Corpus size (default: small)")
+    parser.add_argument("--only", nargs="+", metavar="NAME",
+                        help="Run only these benchmarks (names as listed by --list)")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark; the fastest counts (default: 1)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR,
+                        help=f"Where generated corpora are cached (default: {DEFAULT_CORPUS_DIR})")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the corpora even if cached")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline file to compare with (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Slowdown or memory growth counted as a regression (default: 0.10 = 10%%)")
+    parser.add_argument("--json", metavar="PATH", help="Also write this run's results as JSON")
+    parser.add_argument("--generate", choices=sorted(GENERATORS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate(args.corpus_dir, args.scale, args.generate)
+        return
+
+    if args.list:
+        for bench in BENCHMARKS:
+            print(bench['name'])
+        return
+    benches = [b for b in BENCHMARKS if not args.only or b['name'] in args.only]
+    unknown = set(args.only or ()) - {b['name'] for b in BENCHMARKS}
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    spec = SCALES[args.scale]
+    root = ensure_corpus(args.corpus_dir, args.scale, sorted({c for b in benches for c in b['corpus']}),
+                         args.regenerate)
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+    base = baseline.get(args.scale, {})
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<24}{'wall s':>9}{'Δ':>7}{'MB/s':>9}{'items/s':>10}{'peak MB':>9}{'Δ':>7}")
+    for bench in benches:
+        runs = [run_once(bench, root, spec) for _ in range(max(1, args.repeat))]
+        result = min(runs, key=lambda r: r['wall_s'])
+        result['peak_rss_mb'] = max((r['peak_rss_mb'] for r in runs), default=None) \
+            if all(r['peak_rss_mb'] is not None for r in runs) else None
+        results[bench['name']] = result
+        old = base.get(bench['name'], {})
+        d_wall = change(result['wall_s'], old.get('wall_s'))
+        d_rss = change(result['peak_rss_mb'], old.get('peak_rss_mb'))
+        if (d_wall or 0) > args.tolerance or (d_rss or 0) > args.tolerance:
+            regressions.append(bench['name'])
+        print(f"{bench['name']:<24}{result['wall_s']:>9.2f}{fmt_change(d_wall):>7}"
+              f"{result['mb_per_s'] or 0:>9.1f}{result['items_per_s'] or 0:>10.1f}"
+              f"{result['peak_rss_mb'] or 0:>9.0f}{fmt_change(d_rss):>7}", flush=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({args.scale: results}, f, indent=2)
+    if args.save_baseline:
+        baseline.setdefault(args.scale, {}).update(results)
+        with open(args.baseline + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        os.replace(args.baseline + '.tmp', args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"Slower or bigger than baseline (>{args.tolerance:.0%}): {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,22 @@
 import sys
 import os
+import glob
+import time
+import argparse
+import itertools
 import logging
-from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from bs4 import BeautifulSoup, Tag
+
+import instrument
+import convert_cache
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Bump whenever cleaning output changes so cached results are redone
+CONVERTER_VERSION = 1
+HTML_EXTENSIONS = ('.html', '.htm')
+
 def remove_inline_svgs(soup):
     try:
         for svg in soup.find_all('svg'):
@@ -65,37 +77,226 @@ def unwrap_spans(soup):
     except Exception as e:
         logging.error(f"Failed to unwrap <span> tags: {e}")
 
-def main():
-    if len(sys.argv) < 2:
-        logging.error("Usage: python clean_html.py inputfile.html")
-        sys.exit(1)
+# Compiled rule set applied by clean_soup() in a single traversal.
+# Together these match the remove_*/unwrap_spans passes above.
+DROP_TAGS = frozenset({'svg'})
+UNWRAP_TAGS = frozenset({'span'})
+DROP_ATTRS = frozenset({'class', 'id', 'style'})
+DROP_ATTR_PREFIXES = ('data-', 'aria-')
+
+def clean_soup(soup):
+    """Apply every cleaning rule to soup in one walk of the tree.
+
+    Produces the same tree as running remove_inline_svgs, remove_classnames,
+    remove_ids, remove_data_tags, remove_aria_tags, remove_style_tags and
+    unwrap_spans one after another.
+    """
+    dropped = []
+    unwrapped = []
+    stack = [soup]
+    while stack:
+        node = stack.pop()
+        # Push children in reverse so tags are visited in document order
+        for child in reversed(node.contents):
+            if not isinstance(child, Tag):
+                continue
+            if child.name in DROP_TAGS:
+                # Nothing inside a dropped element survives, so don't descend
+                dropped.append(child)
+                continue
+            attrs = child.attrs
+            if attrs:
+                for attr in [a for a in attrs if a in DROP_ATTRS or a.startswith(DROP_ATTR_PREFIXES)]:
+                    del attrs[attr]
+            if child.name in UNWRAP_TAGS:
+                unwrapped.append(child)
+            stack.append(child)
+
+    # Mutate only after the walk so the traversal never sees a changing tree
+    for tag in dropped:
+        tag.decompose()
+    for tag in reversed(unwrapped):
+        tag.unwrap()
+    logging.info(f"Removed {len(dropped)} inline SVG elements, unwrapped {len(unwrapped)} <span> tags "
+                 "and stripped class/id/style/data-*/aria-* attributes.")
+
+def pick_parser(name):
+    if name != 'auto':
+        return name
+    try:
+        import lxml  # noqa: F401
+        return 'lxml'
+    except ImportError:
+        return 'html.parser'
+
+def cleaned_path(file_path):
+    root, ext = os.path.splitext(file_path)
+    return root + '_cleaned' + ext
+
+def clean_file(file_path, parser_name='html.parser', force=False):
+    """Clean one HTML file and write it beside the original.
+
+    A page whose bytes were cleaned before with the same parser is taken
+    from the shared conversion cache (convert_cache.py) unless force is set.
+    Returns (out_file, bytes_read, seconds) so callers can report throughput.
+    """
+    start = time.perf_counter()
+    with instrument.stage('read'):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+    parser = pick_parser(parser_name)
+    key = convert_cache.key('clean_html', CONVERTER_VERSION, convert_cache.digest_bytes(data), parser=parser)
+    cleaned_html = None if force else convert_cache.get(key)
+    if cleaned_html is None:
+        with instrument.stage('parse'):
+            soup = BeautifulSoup(convert_cache.decode_text(data), parser)
+        with instrument.stage('clean'):
+            clean_soup(soup)
+
+        with instrument.stage('serialize'):
+            cleaned_html = str(soup).encode('utf-8')
+        convert_cache.put(key, cleaned_html)
+
+    out_file = cleaned_path(file_path)
+    with instrument.stage('write'):
+        with open(out_file, 'wb') as f:
+            f.write(cleaned_html)
+
+    size = os.path.getsize(file_path)
+    instrument.count(bytes_read=size, bytes_written=os.path.getsize(out_file), items=1)
+    instrument.task_done(file=file_path)
+    return out_file, size, time.perf_counter() - start
+
+def collect_inputs(patterns, extensions=HTML_EXTENSIONS, skip_cleaned=True):
+    """Expand files, directories and glob patterns into a sorted list of files.
+
+    Folders and glob patterns contribute the files ending in one of
+    extensions; files named outright are always kept. With skip_cleaned,
+    _cleaned outputs are left out.
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, f) for f in os.listdir(pattern)]
+        elif glob.has_magic(pattern):
+            candidates = glob.glob(pattern, recursive=True)
+        else:
+            candidates = [pattern]
+        for path in candidates:
+            if path != pattern and not (path.lower().endswith(extensions) and os.path.isfile(path)):
+                continue
+            # Never re-clean our own output when pointed at a folder twice
+            if not (skip_cleaned and os.path.splitext(path)[0].endswith('_cleaned')):
+                found.add(path)
+    return sorted(found)
+
+def is_up_to_date(file_path):
+    out_file = cleaned_path(file_path)
+    return out_file != file_path and os.path.exists(out_file) \
+        and os.path.getmtime(out_file) >= os.path.getmtime(file_path)
+
+def _clean_worker(file_path, parser_name, force):
+    # Per-file INFO lines from clean_soup would interleave across processes
+    logging.getLogger().setLevel(logging.WARNING)
+    return clean_file(file_path, parser_name, force)
+
+def run_bounded(func, paths, workers, report, *args):
+    """Run func(path, *args) for every path over a pool of worker processes.
+
+    At most 2 * workers paths are in flight at once, so memory stays bounded
+    by the largest few documents rather than the size of the batch.
+    report(path, future) is called in this process as each one finishes.
+    """
+    pending = {}
+    queue = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path in itertools.islice(queue, workers * 2):
+            pending[pool.submit(func, path, *args)] = path
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report(pending.pop(future), future)
+                for path in itertools.islice(queue, 1):
+                    pending[pool.submit(func, path, *args)] = path
+
+def clean_batch(files, parser_name='html.parser', workers=None, force=False):
+    """Clean many files over a process pool, skipping ones whose output is newer than the input."""
+    workers = workers or os.cpu_count() or 1
+    todo = []
+    skipped = 0
+    for path in files:
+        if not force and is_up_to_date(path):
+            skipped += 1
+        else:
+            todo.append(path)
 
-    file_path = sys.argv[1]
-    if not os.path.exists(file_path):
-        logging.error(f"File does not exist: {file_path}")
-        sys.exit(1)
+    total_bytes = 0
+    failed = 0
+    batch_start = time.perf_counter()
 
-    with open(file_path, encoding='utf-8') as f:
-        html = f.read()
+    def report(path, future):
+        nonlocal total_bytes, failed
+        try:
+            out_file, size, seconds = future.result()
+        except Exception as e:
+            failed += 1
+            logging.error(f"Failed to clean {path}: {e}")
+            return
+        total_bytes += size
+        instrument.count(bytes_read=size, bytes_written=os.path.getsize(out_file), items=1)
+        rate = size / seconds / 1e6 if seconds else 0.0
+        logging.info(f"{path} -> {out_file} ({size / 1e6:.2f} MB in {seconds:.2f}s, {rate:.1f} MB/s)")
 
-    soup = BeautifulSoup(html, 'html.parser')
+    run_bounded(_clean_worker, todo, workers, report, parser_name, force)
 
-    # Order doesn't matter, but unwrapping spans usually comes last
-    remove_inline_svgs(soup)
-    remove_classnames(soup)
-    remove_ids(soup)
-    remove_data_tags(soup)
-    remove_aria_tags(soup)
-    remove_style_tags(soup)
-    unwrap_spans(soup)
+    elapsed = time.perf_counter() - batch_start
+    cleaned = len(todo) - failed
+    logging.info(
+        f"Cleaned {cleaned} files, skipped {skipped} up to date, {failed} failed; "
+        f"{total_bytes / 1e6:.2f} MB in {elapsed:.2f}s "
+        f"({cleaned / elapsed if elapsed else 0.0:.1f} files/s, "
+        f"{total_bytes / 1e6 / elapsed if elapsed else 0.0:.1f} MB/s) with {workers} workers"
+    )
+    return failed
 
-    cleaned_html = str(soup)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Strip SVGs, spans and clutter attributes from HTML files.")
+    parser.add_argument("inputs", nargs="+",
+                        help="HTML file(s), folder(s) or glob pattern(s) such as 'export/**/*.html'")
+    parser.add_argument(
+        "--parser",
+        default="html.parser",
+        choices=["html.parser", "lxml", "auto"],
+        help="BeautifulSoup parser backend. 'lxml' is faster on large pages but wraps fragments in "
+             "<html><body>; 'auto' uses lxml when installed (default: html.parser)",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Worker processes for batch mode (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-clean files even if their _cleaned.html output is newer or the result is cached")
+    convert_cache.add_arguments(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    convert_cache.configure(args)
+    with instrument.session('clean_html', args):
+        # A single plain file keeps the original one-shot behaviour
+        if len(args.inputs) == 1 and os.path.isfile(args.inputs[0]):
+            out_file, _, _ = clean_file(args.inputs[0], args.parser, args.force)
+            logging.info(f"Cleaned HTML written to {out_file}")
+            return
 
-    out_file = file_path.replace('.html', '_cleaned.html')
-    with open(out_file, 'w', encoding='utf-8') as f:
-        f.write(cleaned_html)
+        files = collect_inputs(args.inputs)
+        if not files:
+            logging.error(f"No HTML files found in: {' '.join(args.inputs)}")
+            sys.exit(1)
+        missing = [p for p in files if not os.path.exists(p)]
+        if missing:
+            logging.error(f"File does not exist: {missing[0]}")
+            sys.exit(1)
 
-    logging.info(f"Cleaned HTML written to {out_file}")
+        if clean_batch(files, args.parser, args.workers, args.force):
+            sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -5,14 +5,21 @@ Features
 --------
 1. **Fuzzy / normalised matching** so minor punctuation or spacing
    differences between ToC titles and filenames don't break the match.
+   Exact normalised matches are O(1) lookups. With ``--fuzzy`` anything
+   else falls back to a trigram index with a configurable similarity
+   threshold, and every such substitution is printed so it can be checked.
 2. **Includes all 'orphan' files** (those not referenced in the ToC)
    under an "Unreferenced files" section at the end.
 3. **Skips blank headings** – it only writes a section header if the
    corresponding file is found.
+4. **Watch mode** (``--watch``) keeps the ToC, the file index and the
+   section layout in memory and patches the output whenever a file or the
+   ToC changes, using inotify on Linux and polling elsewhere.
 
 Usage
 -----
 python3 combine_by_toc.py toc.md ./notes_folder -o combined.md
+python3 combine_by_toc.py toc.md ./notes_folder -o combined.md --watch
 
 Requirements: Python ⩾ 3.8 (standard library only).
 """
@@ -20,17 +27,39 @@ Requirements: Python ⩾ 3.8 (standard library only).
 from pathlib import Path
 from urllib.parse import unquote_plus
 import argparse
+import ctypes
+import ctypes.util
+import functools
+import hashlib
+import json
+import math
+import os
 import re
+import select
+import shutil
+import struct
 import sys
+import tempfile
+import time
 import unicodedata
 
+import instrument
+
 # ---------- configuration ----------
 EXT = ".md"         # default file extension to look for
 SEP = "----------"  # dashed separator used for "orphans" section
+FUZZY_THRESHOLD = 0.8   # min trigram similarity for non‑exact title matches with a bare --fuzzy
+MANIFEST_SUFFIX = ".manifest.json"  # sidecar next to the output for incremental reruns
+MANIFEST_VERSION = 1
+POLL_INTERVAL = 0.5  # seconds between folder scans in --watch mode without inotify
+DEBOUNCE = 0.2       # wait for this long without further edits before updating
+MAX_DELAY = 2.0      # ...but never hold an update back longer than this
 # -----------------------------------
 
 TOC_PATTERN = re.compile(r"^(\s*)[-•]\s*(.*?)\s+More actions", re.IGNORECASE)
 
+# --watch re-plans from mostly the same titles and names after every change
+@functools.lru_cache(maxsize=1 << 16)
 def normalise(text: str) -> str:
     """Lower‑case, strip punctuation, collapse whitespace."""
     text = unicodedata.normalize("NFKD", text)
@@ -53,69 +82,589 @@ def parse_toc(toc_path: Path):
     return items
 
 
-def build_file_lookup(folder: Path, ext: str = EXT):
-    """Map *decoded* filenames → Path objects (case‑insensitive)."""
+@functools.lru_cache(maxsize=1 << 16)
+def trigrams(text: str) -> frozenset:
+    """Character trigrams of an already normalised string, padded at both ends."""
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class FileLookup:
+    """Index of Markdown files for ToC matching, built once per run.
+
+    * ``names`` maps *decoded* lower‑case filenames → Path (the old lookup dict).
+    * ``exact`` maps the normalised filename → Path, so exact matches are a
+      single dict lookup instead of a normalise() call per file per title.
+    * ``postings`` maps a trigram → ids of files whose normalised stem
+      contains it, used for the fuzzy fallback.
+    * ``files`` maps every Path → its decoded name, including files whose
+      decoded name collides with another's, for the orphans section.
+
+    ``add`` and ``remove`` keep the index as a rebuild would leave it, so
+    ``--watch`` only pays for the files that came or went.
+    """
+
+    def __init__(self, names: dict, files: dict = None):
+        self.files = {path: fname for fname, path in names.items()} if files is None else files
+        self._build(names)
+
+    def _build(self, names: dict):
+        self.names = {}
+        self.exact = {}
+        self.paths = []
+        self.grams = []
+        self.postings = {}
+        self.idents = {}  # decoded name → its id in paths/grams
+        for fname, path in names.items():
+            self._index(fname, path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _index(self, fname: str, path: Path):
+        self.names[fname] = path
+        # First file wins on collisions, as with the old linear scan
+        self.exact.setdefault(normalise(fname), path)
+        grams = trigrams(normalise(os.path.splitext(fname)[0]))
+        ident = len(self.paths)
+        self.idents[fname] = ident
+        self.paths.append(path)
+        self.grams.append(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(ident)
+
+    def add(self, fname: str, path: Path):
+        """Index one more file under its decoded name, as if listed last."""
+        self.files[path] = fname
+        if fname not in self.names:
+            self._index(fname, path)
+            return
+        # Same decoded name as an indexed file: the later one wins, as in a rebuild
+        old = self.names[fname]
+        self.names[fname] = path
+        self.paths[self.idents[fname]] = path
+        key = normalise(fname)
+        if self.exact.get(key) == old:
+            self.exact[key] = path
+
+    def remove(self, path: Path):
+        """Drop one file from the index."""
+        fname = self.files.pop(path)
+        if fname in self.files.values():
+            # Another file shares the decoded name, and which one comes first decides
+            # ties; rare enough to simply start over from the remaining files, in order
+            names = {}
+            for p, name in self.files.items():
+                names[name] = p
+            self._build(names)
+            return
+        del self.names[fname]
+        self.paths[self.idents.pop(fname)] = None  # its postings are skipped from now on
+        key = normalise(fname)
+        if self.exact.get(key) == path:
+            # The next file with the same normalised name takes over, if any
+            heir = next((p for name, p in self.names.items() if normalise(name) == key), None)
+            if heir is None:
+                del self.exact[key]
+            else:
+                self.exact[key] = heir
+
+    def fuzzy(self, title: str, threshold: float):
+        """Return the Path most similar to *title* (Dice score ≥ threshold), else None.
+
+        Uses prefix filtering: any file reaching the threshold must share at
+        least one of the query's rarest trigrams, so only those postings are
+        scanned and the candidates are then scored exactly.
+        """
+        query = trigrams(normalise(title))
+        if not query or threshold >= 1:
+            return None
+        min_overlap = math.ceil(threshold * len(query) / (2 - threshold))
+        by_rarity = sorted(query, key=lambda g: len(self.postings.get(g, ())))
+        candidates = set()
+        for gram in by_rarity[:len(query) - min_overlap + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        best, best_score = None, threshold
+        for ident in sorted(candidates):
+            if self.paths[ident] is None:
+                continue
+            grams = self.grams[ident]
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score > best_score or (score == best_score and best is None):
+                best, best_score = ident, score
+        return self.paths[best] if best is not None else None
+
+
+def decoded_name(path: Path, ext: str = EXT):
+    """The lookup key for *path*: its decoded, lower‑case name, or None if it isn't an *ext* file."""
+    stem, suffix = os.path.splitext(path.name)
+    if suffix.lower() != ext:
+        return None
+    return (unquote_plus(stem) + suffix).lower()  # keep .md suffix
+
+
+def build_file_lookup(folder: Path, ext: str = EXT, paths=None) -> FileLookup:
+    """Index *decoded* filenames → Path objects (case‑insensitive).
+
+    *paths* may give the folder's files up front so it isn't listed again.
+    """
     lookup = {}
-    for p in folder.iterdir():
-        if p.suffix.lower() != ext:
-            continue
-        decoded = unquote_plus(p.stem) + p.suffix  # keep .md suffix
-        lookup[decoded.lower()] = p
-    return lookup
+    files = {}
+    for p in folder.iterdir() if paths is None else paths:
+        decoded = decoded_name(p, ext)
+        if decoded is not None:
+            lookup[decoded] = p
+            files[p] = decoded
+    return FileLookup(lookup, files)
 
 
-def find_best_match(title: str, lookup: dict):
-    """Return Path whose normalised key matches the normalised title, else None."""
-    key_norm = normalise(f"{title}{EXT}")
-    for fname, path in lookup.items():
-        if normalise(fname) == key_norm:
-            return path
-    return None
+def find_best_match(title: str, lookup: FileLookup, threshold: float = None):
+    """Return Path whose normalised key matches the normalised title.
 
+    With a *threshold* (0–1) falls back to the closest fuzzy match scoring
+    at least that much and prints the substitution, else None.
+    """
+    path = lookup.exact.get(normalise(f"{title}{EXT}"))
+    if path is None and threshold is not None:
+        path = lookup.fuzzy(title, threshold)
+        if path is not None:
+            print(f"🔍 Fuzzy match: {title} → {path.name}")
+    return path
 
-def merge_by_toc(toc_items, folder: Path, lookup: dict, out_path: Path):
+
+def plan_sections(toc_items, lookup: FileLookup, out_path: Path, threshold: float = None):
+    """Return the output layout as (header, source Path or None) pairs, plus the file count."""
+    plan = []
     used_paths = set()
+    for depth, title in toc_items:
+        path = find_best_match(title, lookup, threshold)
+        if not path:
+            # Skip writing header if we have nothing to insert
+            continue
+
+        used_paths.add(path)
+        heading = "#" * min(depth + 1, 6)
+        plan.append((f"{heading} {title}\n\n", path))
+
+    # --- append orphan files ---
+    orphan_paths = sorted(p for p in lookup.files if p not in used_paths and p != out_path)
+    if orphan_paths:
+        plan.append(("# Unreferenced files\n\n", None))
+        for p in orphan_paths:
+            plan.append((f"{SEP}\n{p.name}\n{SEP}\n\n", p))
+
+    return plan, len(used_paths) + len(orphan_paths)
+
+
+def read_source(path: Path):
+    """Return (stripped text, content hash) for one source file."""
+    data = path.read_bytes()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    # Same newline handling as read_text()
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return text.rstrip(), digest
+
+
+def manifest_path_for(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + MANIFEST_SUFFIX)
+
+
+def load_manifest(out_path: Path):
+    """Return the previous run's sections keyed by (header, source), or None.
+
+    The manifest is only trusted if the output file is exactly as we left it.
+    """
+    try:
+        manifest = json.loads(manifest_path_for(out_path).read_text(encoding="utf-8"))
+        st = out_path.stat()
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("output") != [st.st_size, st.st_mtime_ns]:
+        return None
+    return {(s["header"], s["source"]): s for s in manifest["sections"]}
 
-    with out_path.open("w", encoding="utf-8") as out:
-        for depth, title in toc_items:
-            path = find_best_match(title, lookup)
-            if not path:
-                # Skip writing header if we have nothing to insert
+
+def save_manifest(out_path: Path, sections):
+    st = out_path.stat()
+    manifest = {"version": MANIFEST_VERSION, "output": [st.st_size, st.st_mtime_ns], "sections": sections}
+    path = manifest_path_for(out_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def merge_by_toc(toc_items, folder: Path, lookup: FileLookup, out_path: Path,
+                 threshold: float = None, full: bool = False):
+    """Write the combined document, reusing the previous output where possible.
+
+    A sidecar manifest records every section's header, source, size, mtime,
+    content hash and byte range in the output. On a rerun, sources whose
+    size and mtime are unchanged are not read at all, and only sections whose
+    bytes differ (or have to move) are rewritten.
+    """
+    with instrument.stage("match"):
+        plan, n_files = plan_sections(toc_items, lookup, out_path, threshold)
+    previous = None if full else load_manifest(out_path)
+    return write_plan(plan, n_files, out_path, previous)
+
+
+def write_plan(plan, n_files, out_path: Path, previous, stats=None):
+    """Bring *out_path* in line with *plan*; returns the new manifest sections.
+
+    *previous* holds the sections last written, keyed by (header, source),
+    or None to write from scratch. *stats* may map source Paths to a
+    (size, mtime_ns) already known, saving a stat() per file.
+    """
+    sections = []
+    rehashed = False  # some source had to be read to check it
+    fresh = {}  # index → new bytes for sections that can't be reused
+    for i, (header, path) in enumerate(plan):
+        source = str(path) if path else None
+        entry = {"header": header, "source": source}
+        prev = previous.get((header, source)) if previous else None
+        reuse = prev is not None
+        if path is not None:
+            if stats is not None and path in stats:
+                size, mtime_ns = stats[path]
+            else:
+                st = path.stat()
+                size, mtime_ns = st.st_size, st.st_mtime_ns
+            entry.update(size=size, mtime_ns=mtime_ns, hash=prev["hash"] if prev else None)
+            if not (reuse and prev["size"] == size and prev["mtime_ns"] == mtime_ns):
+                with instrument.stage("read"):
+                    body, entry["hash"] = read_source(path)
+                instrument.count(bytes_read=size)
+                rehashed = True
+                if not (reuse and prev["hash"] == entry["hash"]):
+                    reuse = False
+                    fresh[i] = f"{header}{body}\n\n".encode("utf-8")
+        elif not reuse:
+            fresh[i] = header.encode("utf-8")
+        if reuse:
+            entry["start"], entry["end"] = prev["start"], prev["end"]
+        sections.append(entry)
+
+    # Lay the sections out back to back; old_ranges remembers where reused bytes live now
+    old_ranges = {}
+    offset = 0
+    for i, entry in enumerate(sections):
+        if i in fresh:
+            length = len(fresh[i])
+        else:
+            old_ranges[i] = (entry["start"], entry["end"])
+            length = entry["end"] - entry["start"]
+        entry["start"], entry["end"] = offset, offset + length
+        offset += length
+
+    moved = [i for i, (start, _) in old_ranges.items() if start != sections[i]["start"]]
+    instrument.count(items=len(sections),
+                     bytes_written=sum(sections[i]["end"] - sections[i]["start"] for i in list(fresh) + moved))
+    if previous is None:
+        with instrument.stage("write"), out_path.open("wb") as out:
+            for i in range(len(sections)):
+                out.write(fresh[i])
+    elif fresh or moved or offset != out_path.stat().st_size:
+        with instrument.stage("write"), out_path.open("r+b") as out, tempfile.TemporaryFile() as spool:
+            # Copy bytes that are about to shift before anything overwrites them
+            spool_base = min((old_ranges[i][0] for i in moved), default=0)
+            if moved:
+                out.seek(spool_base)
+                shutil.copyfileobj(out, spool)
+            for i in sorted(list(fresh) + moved):
+                out.seek(sections[i]["start"])
+                if i in fresh:
+                    out.write(fresh[i])
+                else:
+                    start, end = old_ranges[i]
+                    spool.seek(start - spool_base)
+                    out.write(spool.read(end - start))
+            out.truncate(offset)
+        print(f"🔁 Rewrote {len(fresh)} changed and moved {len(moved)} of {len(sections)} sections")
+    else:
+        if rehashed:
+            save_manifest(out_path, sections)  # so the next run can skip the rehash
+        print(f"✅ Up to date: {out_path}")
+        return sections
+
+    save_manifest(out_path, sections)
+    print(f"✅ Combined {n_files} files → {out_path}")
+    return sections
+
+
+# ---------- watch mode ----------
+IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x4, 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+IN_Q_OVERFLOW = 0x4000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class Inotify:
+    """Minimal inotify reader over ctypes: which names changed in some folders."""
+
+    def __init__(self, libc, folders):
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}
+        for folder in folders:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"cannot watch {folder}")
+            self.folders[wd] = folder
+
+    @classmethod
+    def open(cls, folders):
+        """Return an Inotify on *folders*, or None where inotify isn't available."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            return cls(libc, folders)
+        except (OSError, AttributeError):
+            return None
+
+    def read(self, timeout=None):
+        """Wait up to *timeout* seconds (None: forever) for events; return (folder, name, mask) triples."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+                name = data[pos + INOTIFY_EVENT.size:pos + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                pos += INOTIFY_EVENT.size + length
+                events.append((self.folders.get(wd), os.fsdecode(name), mask))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def scan_folder(folder: Path, ext: str = EXT, skip: str = None) -> dict:
+    """Map the name of every *ext* file in *folder* (except *skip*) to its (size, mtime_ns)."""
+    found = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name == skip or os.path.splitext(entry.name)[1].lower() != ext:
                 continue
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    found[entry.name] = (st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                pass  # deleted while we looked
+    return found
+
+
+def file_state(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class Watcher:
+    """Keeps one combined output in sync with its ToC and folder.
+
+    The parsed ToC, the file lookup, the section plan and the manifest
+    sections all stay in memory between updates. An update re-parses the
+    ToC only if it changed, rebuilds the lookup and plan only if files came
+    or went, and otherwise just re-reads the edited files and patches their
+    sections in place.
+    """
+
+    def __init__(self, toc: Path, folder: Path, out_path: Path, threshold: float = None):
+        self.toc, self.folder, self.out_path, self.threshold = toc, folder, out_path, threshold
+        self.folder_key = os.path.realpath(folder)
+        self.toc_key = os.path.realpath(toc.parent)
+        # Our own writes to the output must not count as edits
+        out_real = os.path.realpath(out_path)
+        self.skip = os.path.basename(out_real) if os.path.dirname(out_real) == self.folder_key else None
+        self.paths = {}  # name → Path, so each source keeps one Path object
+        self.files = {}
+        self.toc_items = None
+        self.toc_state = None
+        self.lookup = None
+        self.plan = self.n_files = None
+        self.previous = None
+        self.out_state = None
+
+    def load_toc(self) -> bool:
+        """Re-parse the ToC; on failure keep the last good one and return False."""
+        self.toc_state = file_state(self.toc)
+        try:
+            with instrument.stage("parse"):
+                items = parse_toc(self.toc)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read the ToC ({e}); keeping the previous one.")
+            return False
+        if not items:
+            print("⚠️  No valid ToC items parsed; keeping the previous ToC.")
+            return False
+        self.toc_items = items
+        return True
+
+    def start(self, full: bool = False):
+        if not self.load_toc():
+            sys.exit("❌ No valid ToC items parsed – check your file.")
+        self.files = scan_folder(self.folder, EXT, self.skip)
+        with instrument.stage("index"):
+            self.lookup = build_file_lookup(self.folder, EXT, [self.path(name) for name in self.files])
+        self.update(replan=True, previous=None if full else load_manifest(self.out_path))
+
+    def path(self, name: str) -> Path:
+        if name not in self.paths:
+            self.paths[name] = self.folder / name
+        return self.paths[name]
+
+    def update(self, replan: bool, previous, added=(), removed=()):
+        if added or removed:
+            with instrument.stage("index"):
+                for name in removed:
+                    self.lookup.remove(self.paths[name])
+                for name in added:
+                    self.lookup.add(decoded_name(self.path(name)), self.path(name))
+            replan = True
+        if replan:
+            with instrument.stage("match"):
+                self.plan, self.n_files = plan_sections(self.toc_items, self.lookup, self.out_path,
+                                                        self.threshold)
+        stats = {self.paths[name]: state for name, state in self.files.items()}
+        sections = write_plan(self.plan, self.n_files, self.out_path, previous, stats)
+        self.previous = {(s["header"], s["source"]): s for s in sections}
+        self.out_state = file_state(self.out_path)
+
+    def apply(self, files: dict, toc_changed: bool):
+        """Bring the output up to date with a new folder listing; returns True if anything changed."""
+        added = [name for name in files if name not in self.files]
+        removed = [name for name in self.files if name not in files]
+        modified = [name for name, state in files.items() if self.files.get(name, state) != state]
+        if toc_changed and file_state(self.toc) == self.toc_state:
+            toc_changed = False
+        if not (added or removed or modified or toc_changed):
+            return False
+        print(f"🕒 {time.strftime('%H:%M:%S')}: {len(added)} added, {len(removed)} removed, "
+              f"{len(modified)} edited{', ToC changed' if toc_changed else ''}")
+        replan = toc_changed and self.load_toc()
+        self.files = files
+        # Someone else rewrote the output: start it over rather than patch unknown bytes
+        previous = self.previous if file_state(self.out_path) == self.out_state else None
+        try:
+            self.update(replan, previous, added, removed)
+        except (OSError, ValueError) as e:
+            # A file vanished or was half written; its next event brings it back in, and
+            # its stale manifest entry makes sure it is read again then
+            print(f"⚠️  Update skipped: {e}")
+        return True
+
+    def listing(self, names, rescan):
+        """The folder listing after changes to *names*, patched from the last one unless *rescan*."""
+        if rescan:
+            return scan_folder(self.folder, EXT, self.skip)
+        files = dict(self.files)
+        for name in names:
+            state = file_state(self.path(name))
+            if state is None:
+                files.pop(name, None)
+            else:
+                files[name] = state
+        return files
+
+    def poll(self):
+        return scan_folder(self.folder, EXT, self.skip), file_state(self.toc)
 
-            used_paths.add(path)
-            heading = "#" * min(depth + 1, 6)
-            out.write(f"{heading} {title}\n\n")
-            out.write(path.read_text(encoding="utf-8").rstrip())
-            out.write("\n\n")
+    def wait(self, notifier):
+        """Block until something changed and edits have settled; returns (listing, toc_changed)."""
+        if notifier is None:
+            # One scandir pass per interval; once something moved, rescan until it holds still
+            current = self.poll()
+            while current == (self.files, self.toc_state):
+                time.sleep(POLL_INTERVAL)
+                current = self.poll()
+            deadline = time.monotonic() + MAX_DELAY
+            while time.monotonic() < deadline:
+                time.sleep(DEBOUNCE)
+                latest, current = current, self.poll()
+                if current == latest:
+                    break
+            return current[0], current[1] != self.toc_state
 
-        # --- append orphan files ---
-        orphan_paths = sorted(
-            [p for p in folder.iterdir() if p.suffix.lower() == EXT and p not in used_paths and p != out_path]
-        )
-        if orphan_paths:
-            out.write("# Unreferenced files\n\n")
-            for p in orphan_paths:
-                out.write(f"{SEP}\n{p.name}\n{SEP}\n\n")
-                out.write(p.read_text(encoding="utf-8").rstrip())
-                out.write("\n\n")
+        names, rescan, toc_changed = set(), False, False
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, min(DEBOUNCE, deadline - time.monotonic()))
+            events = notifier.read(timeout)
+            for folder, name, mask in events:
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                if folder == self.toc_key and name == self.toc.name:
+                    toc_changed = True
+                if (folder == self.folder_key and name != self.skip
+                        and os.path.splitext(name)[1].lower() == EXT):
+                    names.add(name)
+            if deadline is None and (names or rescan or toc_changed):
+                deadline = time.monotonic() + MAX_DELAY
+            if deadline is not None and (not events or time.monotonic() >= deadline):
+                return self.listing(names, rescan), toc_changed
 
-    print(f"✅ Combined {len(used_paths) + len(orphan_paths)} files → {out_path}")
+    def run(self, full: bool = False):
+        self.start(full)
+        notifier = Inotify.open(sorted({self.folder_key, self.toc_key}))
+        how = "inotify" if notifier else f"polling every {POLL_INTERVAL}s"
+        print(f"👀 Watching {self.folder} and {self.toc} ({how}); press Ctrl+C to stop.")
+        try:
+            while True:
+                try:
+                    files, toc_changed = self.wait(notifier)
+                except OSError as e:
+                    print(f"⚠️  Cannot list {self.folder}: {e}")
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                self.apply(files, toc_changed)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching.")
+        finally:
+            if notifier:
+                notifier.close()
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Combine Markdown files using a bullet‑list ToC.")
     parser.add_argument("toc", type=Path, help="Path to the ToC markdown/text file")
     parser.add_argument("folder", type=Path, help="Folder containing the Markdown files")
     parser.add_argument("-o", "--output", type=Path, default=Path("combined.md"), help="Output file name")
-    args = parser.parse_args()
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=FUZZY_THRESHOLD, metavar="THRESHOLD",
+                        help="Let ToC titles without an exact match use the most similar filename scoring at "
+                             f"least THRESHOLD (0–1, default {FUZZY_THRESHOLD}); each substitution is printed. "
+                             "Without it only exact matches are used")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the incremental manifest and rebuild the output from scratch")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and update the output whenever a file or the ToC changes")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
 
-    toc_items = parse_toc(args.toc)
-    if not toc_items:
-        sys.exit("❌ No valid ToC items parsed – check your file.")
+    with instrument.session("combine_by_toc", args):
+        if args.watch:
+            Watcher(args.toc, args.folder, args.output, args.fuzzy).run(args.full)
+            return
+        with instrument.stage("parse"):
+            toc_items = parse_toc(args.toc)
+        if not toc_items:
+            sys.exit("❌ No valid ToC items parsed – check your file.")
 
-    file_lookup = build_file_lookup(args.folder)
-    merge_by_toc(toc_items, args.folder, file_lookup, args.output)
+        with instrument.stage("index"):
+            file_lookup = build_file_lookup(args.folder)
+        merge_by_toc(toc_items, args.folder, file_lookup, args.output, args.fuzzy, args.full)
 
 
 if __name__ == "__main__":
@@ -14,34 +14,120 @@ nextfile.md
 <contents of nextfile.md>
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
+import os
 import sys
+import time
+
+import instrument
 
 SEPARATOR = "----------"
+STAT_THREADS = 16
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
 
-def combine_md(source_dir: Path, output_path: Path, ext: str = ".md") -> None:
-    md_files = sorted(
-        [p for p in source_dir.iterdir() if p.suffix == ext and p != output_path]
-    )
+def find_files(source_dir: Path, ext: str, recursive: bool = False, exclude: Path = None) -> list:
+    """Return the paths of all files ending in ext, relative to source_dir, sorted.
+
+    Subfolders are walked with os.scandir when recursive is set; symlinked
+    folders are not followed. Paths are sorted folder by folder, so the
+    order is the same on every machine.
+    """
+    root = os.path.realpath(source_dir)
+    exclude = os.path.realpath(exclude) if exclude else None
+    found = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(source_dir, rel_dir)) as entries:
+            for entry in entries:
+                rel = os.path.join(rel_dir, entry.name)
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    stack.append(rel)
+                elif (os.path.splitext(entry.name)[1] == ext and entry.is_file()
+                      and os.path.join(root, rel) != exclude):
+                    found.append(rel)
+    return sorted(found, key=lambda rel: rel.split(os.sep))
+
+# sendfile only accepts a regular file as its destination on Linux
+_fast_copy = hasattr(os, "copy_file_range") or (hasattr(os, "sendfile") and sys.platform.startswith("linux"))
+
+def copy_bytes(src_fd: int, dst_fd: int, size: int) -> int:
+    """Append size bytes from src_fd to dst_fd; returns the bytes copied.
+
+    Uses copy_file_range or sendfile so the data never enters Python, and
+    falls back to a buffered copy where neither works (e.g. across file
+    systems on older kernels, or on macOS and Windows).
+    """
+    global _fast_copy
+    copied = 0
+    if _fast_copy:
+        try:
+            while copied < size:
+                if hasattr(os, "copy_file_range"):
+                    n = os.copy_file_range(src_fd, dst_fd, size - copied)
+                else:
+                    n = os.sendfile(dst_fd, src_fd, None, size - copied)
+                if n == 0:  # the file got shorter since it was listed
+                    return copied
+                copied += n
+            return copied
+        except OSError:
+            if copied:
+                raise
+            _fast_copy = False
+    with open(src_fd, "rb", closefd=False) as src, open(dst_fd, "wb", closefd=False) as dst:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            dst.write(chunk)
+            copied += len(chunk)
+    return copied
+
+def combine_md(source_dir: Path, output_path: Path, ext: str = ".md", recursive: bool = False) -> None:
+    with instrument.stage("scan"):
+        md_files = find_files(source_dir, ext, recursive, exclude=output_path)
 
     if not md_files:
         sys.exit(f"No '{ext}' files found in {source_dir}")
 
-    with output_path.open("w", encoding="utf-8") as out_file:
-        for i, md in enumerate(md_files, 1):
-            header = f"{SEPARATOR}\n{md.name}\n{SEPARATOR}\n"
-            out_file.write(header)
-            out_file.write(md.read_text(encoding="utf-8"))
+    # Look up sizes in parallel; on network drives each stat is a round trip
+    def file_sizes(chunk):
+        return [os.stat(os.path.join(source_dir, rel)).st_size for rel in chunk]
+
+    step = -(-len(md_files) // STAT_THREADS)
+    with instrument.stage("stat"), ThreadPoolExecutor(STAT_THREADS) as pool:
+        chunks = pool.map(file_sizes, [md_files[i:i + step] for i in range(0, len(md_files), step)])
+        sizes = [size for chunk in chunks for size in chunk]
 
-            # Add a blank line between files (even after the last one)
-            out_file.write("\n\n")
+    out_fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+    last_progress = time.monotonic()
+    try:
+        with instrument.stage("copy"):
+            gap = b""
+            for i, (rel, size) in enumerate(zip(md_files, sizes), 1):
+                name = rel.replace(os.sep, "/")
+                # The blank line after the previous file and this file's header go out in one write
+                os.write(out_fd, gap + f"{SEPARATOR}\n{name}\n{SEPARATOR}\n".encode("utf-8"))
+                src_fd = os.open(os.path.join(source_dir, rel), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                try:
+                    copied = copy_bytes(src_fd, out_fd, size)
+                finally:
+                    os.close(src_fd)
+                instrument.count(bytes_read=copied, items=1)
+                # Add a blank line between files (even after the last one)
+                gap = b"\n\n"
 
-            print(f"[{i}/{len(md_files)}] Added {md.name}")
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    print(f"[{i}/{len(md_files)}] Added {name}")
+                    last_progress = time.monotonic()
+            os.write(out_fd, gap)
+    finally:
+        os.close(out_fd)
 
+    instrument.count(bytes_written=output_path.stat().st_size)
     print(f"\n✅ Combined {len(md_files)} files into {output_path}")
 
-def main() -> None:
+def main(argv=None) -> None:
     parser = argparse.ArgumentParser(description="Combine Markdown files.")
     parser.add_argument(
         "folder",
@@ -60,9 +146,18 @@ def main() -> None:
         default=".md",
         help="File extension to include (default: .md)",
     )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="Also include files in subfolders (headers then show the path inside the folder)",
+    )
+
+    instrument.add_arguments(parser)
 
-    args = parser.parse_args()
-    combine_md(args.folder, args.output, args.ext)
+    args = parser.parse_args(argv)
+    with instrument.session("combine_md", args):
+        combine_md(args.folder, args.output, args.ext, args.recursive)
 
 if __name__ == "__main__":
     main()
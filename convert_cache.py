@@ -0,0 +1,396 @@
+"""
+Shared, content-addressed cache of conversion results.
+
+Before converting anything, docx2md, clean_html, html2md and
+pdf_to_png_nomadmin look the result up by the input's content digest, the
+tool, its options and its converter version:
+
+    key = convert_cache.key('html2md', CONVERTER_VERSION, convert_cache.digest_bytes(data))
+    markdown = convert_cache.get(key)
+    if markdown is None:
+        markdown = convert(data)
+        convert_cache.put(key, markdown)
+
+Results are stored as files under <cache dir>/blobs and indexed in a SQLite
+database (<cache dir>/index.sqlite) that records their sizes and when each
+was last used. When the total passes the byte budget, the least recently
+used results are dropped. Any number of processes can share one cache:
+SQLite serialises the index updates and blobs are written atomically.
+Lookups only read the index; their hit/miss counts and use times are kept
+in memory and written out in batches, with the next put and at exit.
+
+The cache is off unless asked for: --cache (or OFFICE_TOOLS_CACHE=on) uses
+~/.cache/office-tools with a 1024 MB budget, --cache-dir (or
+OFFICE_TOOLS_CACHE=<folder>) another folder. The scripts also accept
+--cache-size and --no-cache, and pass the choice on to their worker
+processes through the environment. A cache that
+cannot be opened or written is skipped with a warning; it never fails a
+conversion. Run this file to see hit/miss counts per tool, or to trim or
+clear the cache.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import contextlib
+import multiprocessing.util
+
+import instrument
+
+CACHE_ENV = 'OFFICE_TOOLS_CACHE'  # cache folder, 'on' for the default folder, or 'off'
+SIZE_ENV = 'OFFICE_TOOLS_CACHE_MB'
+DEFAULT_SIZE_MB = 1024
+MB = 1024 * 1024
+# Evicting down to a bit below the budget means not every later put has to evict again
+TRIM_TO = 0.9
+# Lookups whose counts and use times are held in memory before they are written out
+FLUSH_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    tool TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    bytes_served INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('total_bytes', 0);
+"""
+
+def default_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'office-tools')
+
+def digest_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def decode_text(data):
+    """Decode UTF-8 bytes exactly as open(path, encoding='utf-8').read() would, newlines included."""
+    text = data.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def key(tool, version, digest, **options):
+    """The cache key for one result: the tool's name and a hash of everything the result depends on."""
+    spec = json.dumps([tool, version, digest, options], sort_keys=True)
+    return tool, hashlib.blake2b(spec.encode('utf-8'), digest_size=16).hexdigest()
+
+class ConversionCache:
+    """A folder of result blobs plus the SQLite index that sizes, dates and evicts them."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        # Autocommit; writes take the lock explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), timeout=60, isolation_level=None)
+        # WAL lets readers carry on while another process writes
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        with self._write():
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    self.db.execute(statement)
+        # Hit/miss counts and use times from get(), written out by flush() so that
+        # lookups never wait for the write lock
+        self.counts = {}
+        self.touched = {}
+        self.lookups = 0
+        # Runs at interpreter exit, and at exit of multiprocessing workers, which skip atexit
+        self._finalizer = multiprocessing.util.Finalize(self, self._flush_at_exit, exitpriority=10)
+
+    def close(self):
+        self._finalizer.cancel()
+        try:
+            self.flush()
+        finally:
+            self.db.close()
+
+    @contextlib.contextmanager
+    def _write(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def _blob_path(self, name):
+        return os.path.join(self.root, 'blobs', name[:2], name)
+
+    def _count(self, db, tool, hits=0, misses=0, served=0):
+        db.execute('INSERT OR IGNORE INTO counters (tool) VALUES (?)', (tool,))
+        db.execute('UPDATE counters SET hits = hits + ?, misses = misses + ?, bytes_served = bytes_served + ? '
+                   'WHERE tool = ?', (hits, misses, served, tool))
+
+    def _add_total(self, db, delta):
+        db.execute("UPDATE meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+        return db.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _flush(self, db):
+        for tool, (hits, misses, served) in self.counts.items():
+            self._count(db, tool, hits, misses, served)
+        db.executemany('UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?',
+                       [(used, name) for name, used in self.touched.items()])
+        self.counts.clear()
+        self.touched.clear()
+        self.lookups = 0
+
+    def flush(self):
+        """Write out the hit/miss counts and use times held since the last flush."""
+        if self.counts:
+            with self._write() as db:
+                self._flush(db)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            _warn(e)
+
+    def get(self, key):
+        """The stored result for key as bytes, or None."""
+        tool, name = key
+        row = self.db.execute('SELECT size FROM entries WHERE key = ?', (name,)).fetchone()
+        data = None
+        if row:
+            try:
+                with open(self._blob_path(name), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Evicted by another process since the lookup; drop the stale row
+                with self._write() as db:
+                    if db.execute('DELETE FROM entries WHERE key = ?', (name,)).rowcount:
+                        self._add_total(db, -row[0])
+        hits, misses, served = self.counts.get(tool, (0, 0, 0))
+        if data is None:
+            self.counts[tool] = hits, misses + 1, served
+            instrument.count(cache_misses=1)
+        else:
+            self.counts[tool] = hits + 1, misses, served + len(data)
+            self.touched[name] = time.time()
+            instrument.count(cache_hits=1)
+        self.lookups += 1
+        if self.lookups >= FLUSH_EVERY:
+            self.flush()
+        return data
+
+    def put(self, key, data):
+        """Store data under key, then evict the least recently used results if over budget."""
+        tool, name = key
+        if len(data) > self.max_bytes * TRIM_TO:
+            return
+        path = self._blob_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        now = time.time()
+        with self._write() as db:
+            old = db.execute('SELECT size FROM entries WHERE key = ?', (name,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', (name, tool, len(data), now, now))
+            total = self._add_total(db, len(data) - (old[0] if old else 0))
+            # The lock is taken anyway, so the held counts go along
+            self._flush(db)
+            doomed = self._evict(db, total, self.max_bytes, keep=name) if total > self.max_bytes else []
+        self._remove_blobs(doomed)
+
+    def _evict(self, db, total, max_bytes, keep=None):
+        """Drop index rows, oldest use first, until total fits; returns the dropped keys."""
+        target = max_bytes * TRIM_TO
+        doomed = []
+        for name, size in db.execute('SELECT key, size FROM entries ORDER BY last_used'):
+            if total <= target:
+                break
+            if name != keep:
+                doomed.append(name)
+                total -= size
+        db.executemany('DELETE FROM entries WHERE key = ?', [(name,) for name in doomed])
+        db.execute("UPDATE meta SET value = ? WHERE name = 'total_bytes'", (total,))
+        return doomed
+
+    def _remove_blobs(self, names):
+        # After the commit, so no other process is still handed these keys by the index
+        for name in names:
+            try:
+                os.remove(self._blob_path(name))
+            except FileNotFoundError:
+                pass
+
+    def trim(self, max_bytes=None):
+        """Evict down to the budget (or max_bytes); returns how many results were dropped."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self._write() as db:
+            total = db.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+            doomed = self._evict(db, total, max_bytes) if total > max_bytes else []
+        self._remove_blobs(doomed)
+        return len(doomed)
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM entries')
+            db.execute('DELETE FROM counters')
+            self.counts.clear()
+            self.touched.clear()
+            db.execute("UPDATE meta SET value = 0 WHERE name = 'total_bytes'")
+            shutil.rmtree(os.path.join(self.root, 'blobs'), ignore_errors=True)
+            os.makedirs(os.path.join(self.root, 'blobs'), exist_ok=True)
+
+    def info(self):
+        self.flush()
+        entries, total = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        tools = {tool: {'hits': hits, 'misses': misses, 'bytes_served': served}
+                 for tool, hits, misses, served in
+                 self.db.execute('SELECT tool, hits, misses, bytes_served FROM counters ORDER BY tool')}
+        for tool, count, size in self.db.execute('SELECT tool, COUNT(*), SUM(size) FROM entries GROUP BY tool'):
+            tools.setdefault(tool, {'hits': 0, 'misses': 0, 'bytes_served': 0}).update(entries=count, bytes=size)
+        return {'dir': self.root, 'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes, 'tools': tools}
+
+# One cache per process, reopened when the settings change or in a forked worker
+_shared = None
+_shared_config = None
+_warned = False
+
+def _warn(error):
+    global _warned
+    if not _warned:
+        print(f"Warning: conversion cache disabled: {error}", file=sys.stderr)
+        _warned = True
+
+def settings():
+    """The (folder, byte budget) this process should use, or None if the cache is off."""
+    folder = os.environ.get(CACHE_ENV, 'off')
+    if folder in ('', 'off'):
+        return None
+    if folder == 'on':
+        folder = default_dir()
+    size_mb = float(os.environ.get(SIZE_ENV) or DEFAULT_SIZE_MB)
+    return folder, int(size_mb * MB)
+
+def shared():
+    """This process's ConversionCache, or None when the cache is off or unusable."""
+    global _shared, _shared_config
+    config = settings()
+    if config is None:
+        return None
+    config = config + (os.getpid(),)
+    if config != _shared_config:
+        # A connection must not be used across fork, so workers open their own
+        old = _shared if _shared_config and _shared_config[2] == config[2] else None
+        _shared_config = config
+        try:
+            if old is not None:
+                old.close()
+            _shared = ConversionCache(config[0], config[1])
+        except (OSError, sqlite3.Error) as e:
+            _warn(e)
+            _shared = None
+    return _shared
+
+def enabled():
+    return shared() is not None
+
+def get(key):
+    cache = shared()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except (OSError, sqlite3.Error) as e:
+        _warn(e)
+        return None
+
+def put(key, data):
+    cache = shared()
+    if cache is None:
+        return
+    try:
+        cache.put(key, data)
+    except (OSError, sqlite3.Error) as e:
+        _warn(e)
+
+def add_arguments(parser):
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse earlier results from the conversion cache in ~/.cache/office-tools")
+    parser.add_argument("--cache-dir", metavar="DIR", help="Use the conversion cache in DIR instead (implies --cache)")
+    parser.add_argument("--cache-size", type=float, metavar="MB",
+                        help=f"Byte budget of the conversion cache in MB (default: {DEFAULT_SIZE_MB})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Neither use nor fill the conversion cache, even if {CACHE_ENV} is set")
+
+def configure(args):
+    """Apply --cache/--cache-dir/--cache-size/--no-cache for this run and for the worker processes it starts."""
+    if getattr(args, 'no_cache', False):
+        os.environ[CACHE_ENV] = 'off'
+    elif getattr(args, 'cache_dir', None):
+        os.environ[CACHE_ENV] = os.path.abspath(args.cache_dir)
+    elif getattr(args, 'cache', False) and settings() is None:
+        os.environ[CACHE_ENV] = 'on'
+    if getattr(args, 'cache_size', None):
+        os.environ[SIZE_ENV] = str(args.cache_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show, trim or clear the shared conversion cache.")
+    parser.add_argument("--cache-dir", metavar="DIR", help="Cache folder (default: ~/.cache/office-tools)")
+    parser.add_argument("--cache-size", type=float, metavar="MB",
+                        help=f"Budget to trim to (default: {DEFAULT_SIZE_MB})")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--trim", action="store_true", help="Evict least recently used results down to the budget")
+    action.add_argument("--clear", action="store_true", help="Delete every cached result and the hit counts")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    args = parser.parse_args(argv)
+    configure(args)
+
+    # The default folder is shown even while the scripts run without the cache
+    config = settings() or (default_dir(), int(float(os.environ.get(SIZE_ENV) or DEFAULT_SIZE_MB) * MB))
+    if not os.path.exists(os.path.join(config[0], 'index.sqlite')):
+        print(f"No conversion cache in {config[0]} yet; pass --cache to the scripts to start one.")
+        return
+    cache = ConversionCache(*config)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.root}")
+    elif args.trim:
+        print(f"Dropped {cache.trim()} results")
+
+    info = cache.info()
+    if args.json:
+        json.dump(info, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{info['dir']}: {info['entries']} results, {info['bytes'] / MB:.1f} MB "
+          f"of {info['max_bytes'] / MB:.0f} MB")
+    if info['tools']:
+        print(f"\n{'tool':<22}{'results':>9}{'MB':>9}{'hits':>9}{'misses':>9}{'hit rate':>10}{'MB reused':>11}")
+    for tool, row in info['tools'].items():
+        lookups = row['hits'] + row['misses']
+        rate = f"{row['hits'] / lookups:.0%}" if lookups else '-'
+        print(f"{tool:<22}{row.get('entries', 0):>9}{row.get('bytes', 0) / MB:>9.1f}{row['hits']:>9}"
+              f"{row['misses']:>9}{rate:>10}{row['bytes_served'] / MB:>11.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,14 @@
+import os
 import re
 import sys
-from collections import defaultdict
+import zlib
+import operator
+import hashlib
+import argparse
+from array import array
+from collections import deque
+
+import instrument
 
 def extract_sections(md):
     # Splits the doc by headings (any level) and keeps headings with their content
@@ -21,52 +29,265 @@ def sections_to_str(sections):
 def normalize(text):
     return re.sub(r'\s+', ' ', text.strip().lower())
 
-def main(infile, outfile):
-    with open(infile, "r", encoding="utf-8") as f:
-        md = f.read()
+# Same matches as the split in extract_sections, found one line at a time.
+# [^\r\n] stands in for "." because the file is read without newline translation.
+HEADING_RE = re.compile(r"#{1,6} [^\r\n]*")
+
+# Near-duplicate mode: word shingles and MinHash signature size
+SHINGLE_WORDS = 3
+SKETCH_BINS = 128
+
+class NormalizedDigest:
+    """Incremental blake2b of normalize(text) over text fed in pieces.
+
+    Pieces must be split at line breaks or heading boundaries so that
+    str.lower() sees the same context as it would on the whole text.
+    """
+
+    def __init__(self, sketch=None):
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._started = False
+        self._space = False
+        self.sketch = sketch
+
+    def update(self, piece):
+        if not piece:
+            return
+        low = piece.lower()
+        words = low.split()
+        if self.sketch is not None:
+            self.sketch.update(words)
+        if words:
+            if self._started and (self._space or low[0].isspace()):
+                self._hash.update(b" ")
+            self._hash.update(" ".join(words).encode("utf-8"))
+            self._started = True
+            self._space = low[-1].isspace()
+        else:
+            self._space = True
+
+    def digest(self):
+        return self._hash.digest()
+
+class MinHashSketch:
+    """MinHash signature of a section's word shingles.
+
+    Uses one-permutation hashing: each shingle is hashed once, the low bits
+    pick one of SKETCH_BINS bins and the smallest hash per bin is kept.
+    Empty bins copy the next filled bin to their right (densification); the
+    copied hash still encodes its own bin, so two sections only agree on an
+    empty bin when they share the same next filled bin and value. The
+    fraction of equal bins then estimates Jaccard similarity.
+    """
+
+    def __init__(self):
+        self._words = []
+
+    def update(self, words):
+        self._words.extend(words)
+
+    def signature(self):
+        words = self._words
+        if len(words) >= SHINGLE_WORDS:
+            shingles = map(" ".join, zip(*(words[i:] for i in range(SHINGLE_WORDS))))
+        else:
+            shingles = [" ".join(words)] if words else []
+        # Sorted descending, so the smallest hash in each bin is written last
+        hashes = sorted(map(zlib.crc32, map(str.encode, shingles)), reverse=True)
+        if not hashes:
+            return array("I", [0]) * SKETCH_BINS
+        bins = {h & (SKETCH_BINS - 1): h for h in hashes}
+
+        sig = [0] * SKETCH_BINS
+        filled = sorted(bins)
+        prev = filled[-1] - SKETCH_BINS
+        for p in filled:
+            if prev + 1 < 0:  # the run wrapping round from the last filled bin
+                sig[prev + 1:] = [bins[p]] * -(prev + 1)
+                sig[:p + 1] = [bins[p]] * (p + 1)
+            else:
+                sig[prev + 1:p + 1] = [bins[p]] * (p - prev)
+            prev = p
+        return array("I", sig)
 
-    sections = extract_sections(md)
+def lsh_bands(threshold):
+    """Pick (bands, rows) so that pairs near *threshold* become candidates.
 
-    # Identify duplicate sections (by normalized heading+content)
-    section_dict = defaultdict(list)
-    for idx, (heading, content) in enumerate(sections):
-        key = normalize(heading + "\n" + content)
-        section_dict[key].append(idx)
+    The S-curve midpoint (1/bands) ** (1/rows) is kept at or just below the
+    threshold; false positives are weeded out by comparing signatures.
+    """
+    best = (1, 1)
+    for rows in range(1, SKETCH_BINS + 1):
+        bands = SKETCH_BINS // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
 
-    # Find keys with duplicates
-    dup_keys = [k for k, idxs in section_dict.items() if len(idxs) > 1]
+def find_near_duplicates(sketches, threshold):
+    """Cluster sections whose estimated Jaccard similarity is ≥ threshold.
 
-    appendix = []
-    appendix_refs = {}
-    cleaned_sections = sections.copy()
+    sketches maps digest → signature; returns digest → cluster root digest.
+    Candidates come from LSH buckets, so work is roughly linear in the
+    number of sections rather than quadratic.
+    """
+    parent = {key: key for key in sketches}
 
-    for i, key in enumerate(dup_keys, start=1):
-        idxs = section_dict[key]
-        heading, content = sections[idxs[0]]
-        appendix_id = f"appendix-{i}"
-        appendix.append((f"#### {heading[2:].strip()} (Moved to Appendix)", content))
-        ref = f"[See Appendix §{i}](#appendix-{i})"
-        appendix_refs[key] = ref
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
 
-        # Replace all but the first occurrence with a reference
-        for j in idxs[1:]:
-            cleaned_sections[j] = (heading, ref)
-        # Tag the appendix section for anchor
-        appendix[-1] = (f'<a name="{appendix_id}"></a>\n' + appendix[-1][0], appendix[-1][1])
+    bands, rows = lsh_bands(threshold)
+    needed = threshold * SKETCH_BINS
+    buckets = [{} for _ in range(bands)]
+    for key, sig in sketches.items():
+        for band, bucket in enumerate(buckets):
+            # Most buckets hold one section, so store that as a bare key, not a list
+            band_key = hash(sig[band * rows:(band + 1) * rows].tobytes())
+            members = bucket.get(band_key)
+            if members is None:
+                bucket[band_key] = key
+                continue
+            if not isinstance(members, list):
+                members = bucket[band_key] = [members]
+            for other in members:
+                if find(other) == find(key):
+                    continue
+                if sum(map(operator.eq, sig, sketches[other])) >= needed:
+                    parent[find(key)] = find(other)
+            members.append(key)
+    return {key: find(key) for key in sketches}
 
-    # Reconstruct the cleaned doc
-    doc = sections_to_str(cleaned_sections)
-    if appendix:
-        doc += "\n---\n## Appendix\n\n"
-        doc += sections_to_str(appendix)
+def scan_sections(src, sketch=False):
+    """First pass: stream the binary file src and record where each section lives.
 
-    with open(outfile, "w", encoding="utf-8") as f:
-        f.write(doc)
+    Returns (starts, heading_ends, digests, size, sketches): byte offsets of
+    every heading and of the end of its line, the 16-byte digest of each
+    section's normalized heading+content, the file size, and (with
+    sketch=True) a MinHash signature per distinct digest. A section's
+    content runs from its heading end to the next section's start.
+    """
+    starts = array("q")
+    heading_ends = array("q")
+    digests = bytearray()
+    sketches = {}
+    hasher = None
 
+    def close(hasher):
+        digest = hasher.digest()
+        if hasher.sketch is not None and digest not in sketches:
+            sketches[digest] = hasher.sketch.signature()
+        return digest
+    offset = 0
+    for raw in src:
+        line = raw.decode("utf-8")
+        pos = 0
+        for m in HEADING_RE.finditer(line):
+            if hasher is not None:
+                hasher.update(line[pos:m.start()])
+                digests += close(hasher)
+            starts.append(offset + len(line[:m.start()].encode("utf-8")))
+            heading_ends.append(offset + len(line[:m.end()].encode("utf-8")))
+            hasher = NormalizedDigest(MinHashSketch() if sketch else None)
+            hasher.update(m.group())
+            hasher.update("\n")
+            pos = m.end()
+        if hasher is not None:
+            hasher.update(line[pos:])
+        offset += len(raw)
+    if hasher is not None:
+        digests += close(hasher)
+    return starts, heading_ends, digests, offset, sketches
+
+def read_text(f, start, end):
+    # Match the universal-newline translation of reading in text mode
+    f.seek(start)
+    text = f.read(end - start).decode("utf-8")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+def deduplicate(src, out, near=None):
+    """Deduplicate the seekable binary file src, writing Markdown text to out.
+
+    With near=None only sections whose normalized heading+content are
+    identical are merged; with a Jaccard threshold (0–1) near-duplicates
+    found by MinHash/LSH are merged too, keeping the first occurrence.
+    Returns the number of sections.
+    """
+    with instrument.stage("scan"):
+        starts, heading_ends, digests, size, sketches = scan_sections(src, sketch=near is not None)
+    n = len(starts)
+    ends = starts[1:] + array("q", [size])
+
+    def digest_at(idx):
+        return bytes(digests[idx * 16:(idx + 1) * 16])
+
+    # Identify duplicate sections (by digest of normalized heading+content)
+    first_seen = {}
+    for idx in range(n):
+        first_seen.setdefault(digest_at(idx), idx)
+
+    # Every section points at the first section of its group
+    if near is not None:
+        with instrument.stage("near"):
+            roots = find_near_duplicates(sketches, near)
+        group_first = {}
+        for key, idx in first_seen.items():
+            group_first.setdefault(roots[key], idx)
+        first_seen = {key: group_first[roots[key]] for key in first_seen}
+        sketches.clear()
+    firsts = array("q", (first_seen[digest_at(idx)] for idx in range(n)))
+
+    # Number duplicates in order of their first occurrence
+    repeated = {first for idx, first in enumerate(firsts) if first != idx}
+    appendix_ids = {}
+    for first in sorted(repeated):
+        appendix_ids[first] = len(appendix_ids) + 1
+
+    with instrument.stage("write"):
+        # Text before the first heading is kept as-is, never deduplicated
+        preamble = read_text(src, 0, starts[0] if n else size).strip()
+        if preamble:
+            out.write(f"{preamble}\n\n")
+
+        # Replace all but the first occurrence with a reference (under the first one's heading)
+        for idx in range(n):
+            first = firsts[idx]
+            heading = read_text(src, starts[first], heading_ends[first]).strip()
+            if first != idx:
+                i = appendix_ids[first]
+                content = f"[See Appendix §{i}](#appendix-{i})"
+            else:
+                content = read_text(src, heading_ends[idx], ends[idx]).strip()
+            out.write(f"{heading}\n{content}\n\n")
+
+        if appendix_ids:
+            out.write("\n---\n## Appendix\n\n")
+            for idx, i in appendix_ids.items():
+                heading = read_text(src, starts[idx], heading_ends[idx]).strip()
+                content = read_text(src, heading_ends[idx], ends[idx]).strip()
+                out.write(f'<a name="appendix-{i}"></a>\n#### {heading[2:].strip()} (Moved to Appendix)\n{content}\n\n')
+    return n
+
+def main(infile, outfile, near=None):
+    """Deduplicate infile into outfile (see deduplicate)."""
+    with open(infile, "rb") as src, open(outfile, "w", encoding="utf-8") as out:
+        sections = deduplicate(src, out, near)
+    instrument.count(bytes_read=os.path.getsize(infile), bytes_written=os.path.getsize(outfile), items=sections)
     print(f"Deduplicated file written to: {outfile}")
 
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Move duplicate Markdown sections to an appendix.")
+    parser.add_argument("input", help="Markdown file to deduplicate")
+    parser.add_argument("output", help="Where to write the deduplicated Markdown")
+    parser.add_argument("--near", type=float, metavar="JACCARD",
+                        help="Also merge near-duplicate sections at this word-shingle similarity (e.g. 0.8)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.near is not None and not 0 < args.near <= 1:
+        parser.error("--near must be between 0 and 1")
+    with instrument.session("deduplicate_md", args):
+        main(args.input, args.output, args.near)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python deduplicate_sections.py input.md output.md")
-    else:
-        main(sys.argv[1], sys.argv[2])
+    cli()
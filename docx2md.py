@@ -1,10 +1,31 @@
+import io
 import os
+import re
 import sys
+import json
+import time
+import quopri
 import zipfile
-import email
-from markdownify import markdownify as md
+import argparse
+import binascii
+import mimetypes
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.parser import BytesHeaderParser
+from urllib.parse import quote, unquote, urlsplit
 
-from docx import Document
+import instrument
+import convert_cache
+
+# Bump whenever conversion output changes so cached results are redone
+CONVERTER_VERSION = 3
+CACHE_FILE = '.docx2md-cache.json'
+MIME_CHUNK_SIZE = 1024 * 1024
+ASSET_THREADS = 4
+# A header line ("Name: value") or the folded continuation of one
+HEADER_LINE = re.compile(rb'[!-9;-~]+:|[ \t]')
+# The target of a Markdown link or image: ](target) or ](<target>)
+LINK_TARGET = re.compile(r'(\]\(<?)([^)\s>]+)')
 
 def is_zipfile(path):
     try:
@@ -16,21 +37,211 @@ def is_zipfile(path):
 def is_html_mime(path):
     # Quick test: look for "Content-Type: multipart/" and <html
     try:
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        with open(path, 'rb') as f:
             first_2k = f.read(2048)
-            return "Content-Type: multipart/" in first_2k or "<html" in first_2k.lower()
+            return b"Content-Type: multipart/" in first_2k or b"<html" in first_2k.lower()
     except Exception:
         return False
 
-def extract_html_from_mime(filename):
-    with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-        msg = email.message_from_file(f)
-        for part in msg.walk():
-            if part.get_content_type() == 'text/html':
-                return part.get_payload(decode=True).decode(part.get_content_charset('utf-8'))
+# MIME ("Single File Web Page", Confluence "Word") exports are read straight
+# from the binary file: the multipart structure is found by searching for
+# boundary lines chunk by chunk, and only the parts that are wanted are read
+# and decoded. The images in a 200 MB export are never loaded just to reach
+# its HTML.
+
+def _read_headers(f):
+    """Parse the header block at f's position, leaving f at the start of the body."""
+    lines = []
+    while True:
+        pos = f.tell()
+        line = f.readline(MIME_CHUNK_SIZE)
+        if not line or not line.strip():
+            break
+        if not HEADER_LINE.match(line):
+            f.seek(pos)  # no blank line: the body starts here
+            break
+        lines.append(line)
+    return BytesHeaderParser().parsebytes(b''.join(lines))
+
+def _find_delimiter(f, boundary, pos, limit):
+    """Find the next "--boundary" line at or after pos (a line start) and before limit.
+
+    Returns (line_start, line_end, is_closing) or None.
+    """
+    needle = b'\n--' + boundary
+    keep = len(needle) - 1
+    # buf always starts at file offset base; the newline before pos is part of the needle
+    if pos > 0:
+        base, tail = pos - 1, b''
+    else:
+        base, tail = -1, b'\n'
+    f.seek(base + len(tail))
+    while True:
+        chunk = f.read(MIME_CHUNK_SIZE)
+        buf = tail + chunk
+        i = buf.find(needle)
+        while i >= 0:
+            line_start = base + i + 1
+            if line_start >= limit:
+                return None
+            f.seek(line_start)
+            line = f.readline(len(needle) + 1024)
+            rest = line[keep:]
+            closing = rest.startswith(b'--')
+            # "--boundary" must be followed by nothing but "--" and whitespace
+            if not (rest[2:] if closing else rest).strip():
+                return line_start, line_start + len(line), closing
+            i = buf.find(needle, i + 1)
+        if not chunk:
+            return None
+        next_read = base + len(buf)
+        if len(buf) > keep:
+            base, tail = next_read - keep, buf[-keep:]
+        else:
+            tail = buf
+        f.seek(next_read)
+
+def _body_end(f, line_start, body_start):
+    # The line break before a delimiter belongs to the delimiter
+    if line_start - body_start >= 2:
+        f.seek(line_start - 2)
+        return line_start - (2 if f.read(2) == b'\r\n' else 1)
+    return max(body_start, line_start - 1)
+
+def mime_parts(f):
+    """Yield (headers, start, end) for every leaf part of the MIME file f.
+
+    f is a seekable binary file. start and end are the byte offsets of the
+    part's still-encoded body; nothing but headers is read here.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    headers = _read_headers(f)
+    yield from _leaf_parts(f, headers, f.tell(), size)
+
+def _leaf_parts(f, headers, start, end):
+    boundary = headers.get_boundary() if headers.get_content_maintype() == 'multipart' else None
+    if not boundary:
+        yield headers, start, end
+        return
+    boundary = boundary.encode('utf-8')
+    found = _find_delimiter(f, boundary, start, end)  # skips the preamble
+    while found and not found[2]:
+        f.seek(found[1])
+        part_headers = _read_headers(f)
+        body_start = f.tell()
+        found_next = _find_delimiter(f, boundary, body_start, end)
+        body_end = _body_end(f, found_next[0], body_start) if found_next else end
+        # A nested multipart is searched only within this part's bytes
+        yield from _leaf_parts(f, part_headers, body_start, body_end)
+        found = found_next
+
+def decode_part(f, headers, start, end):
+    """Read one part's body from f and undo its Content-Transfer-Encoding."""
+    f.seek(start)
+    raw = f.read(end - start)
+    encoding = (headers.get('Content-Transfer-Encoding') or '').strip().lower()
+    if encoding == 'base64':
+        return binascii.a2b_base64(raw)
+    if encoding == 'quoted-printable':
+        return quopri.decodestring(raw)
+    return raw
+
+def _part_text(f, headers, start, end):
+    data = decode_part(f, headers, start, end)
+    try:
+        return data.decode(headers.get_content_charset() or 'utf-8', errors='replace')
+    except LookupError:  # unknown charset name
+        return data.decode('utf-8', errors='replace')
+
+def read_mime_html(f):
+    """Decode only the text/html part of the MIME file f (binary, seekable); None if there is none."""
+    for headers, start, end in mime_parts(f):
+        if headers.get_content_type() == 'text/html':
+            return _part_text(f, headers, start, end)
     return None
 
+def html_from_mime(text):
+    return read_mime_html(io.BytesIO(text.encode('utf-8')))
+
+def extract_html_from_mime(filename):
+    with open(filename, 'rb') as f:
+        return read_mime_html(f)
+
+def _asset_name(headers, number, used):
+    location = headers.get('Content-Location') or ''
+    name = headers.get_filename() or os.path.basename(unquote(urlsplit(location).path).replace('\\', '/'))
+    if not name:
+        name = (headers.get('Content-ID') or '').strip('<> ').split('@')[0]
+    name = re.sub(r'[^\w.-]+', '_', name).strip('._') or f'image{number:03d}'
+    if not os.path.splitext(name)[1]:
+        name += mimetypes.guess_extension(headers.get_content_type()) or ''
+    stem, ext = os.path.splitext(name)
+    unique, n = name, 1
+    while unique.lower() in used:
+        n += 1
+        unique = f'{stem}_{n}{ext}'
+    used.add(unique.lower())
+    return unique
+
+def _write_asset(file_path, headers, start, end, out_path):
+    # Each thread reads through its own handle
+    with open(file_path, 'rb') as f:
+        data = decode_part(f, headers, start, end)
+    with open(out_path, 'wb') as out:
+        out.write(data)
+    return len(data)
+
+def extract_mime_assets(file_path, assets_dir, link_prefix, workers=ASSET_THREADS):
+    """Stream a MIME export once, returning its HTML and writing its images to assets_dir.
+
+    Images are written by a thread pool while the scan goes on. Returns
+    (html, links): links maps each way the HTML can refer to an image (cid:,
+    its Content-Location, and that location relative to the HTML part's
+    own) to link_prefix + the image's file name.
+    """
+    html, html_location = None, ''
+    images = []
+    used = set()
+    with open(file_path, 'rb') as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        for headers, start, end in mime_parts(f):
+            if html is None and headers.get_content_type() == 'text/html':
+                html = _part_text(f, headers, start, end)
+                html_location = headers.get('Content-Location') or ''
+            elif headers.get_content_maintype() == 'image':
+                if not images:
+                    os.makedirs(assets_dir, exist_ok=True)
+                name = _asset_name(headers, len(images) + 1, used)
+                future = pool.submit(_write_asset, file_path, headers, start, end, os.path.join(assets_dir, name))
+                images.append((headers, name, future))
+        for _, _, future in images:
+            instrument.count(bytes_written=future.result())
+
+    links = {}
+    base = html_location.rsplit('/', 1)[0] + '/' if '/' in html_location else ''
+    for headers, name, _ in images:
+        target = link_prefix + quote(name)
+        content_id = (headers.get('Content-ID') or '').strip('<> ')
+        if content_id:
+            links['cid:' + content_id] = target
+        location = (headers.get('Content-Location') or '').strip()
+        if location:
+            links[location] = target
+            if base and location.startswith(base):
+                links[location[len(base):]] = target
+    return html, links
+
+def rewrite_links(markdown, links):
+    """Point Markdown links and images whose target is a key of links at its value."""
+    def replace(match):
+        target = match.group(2)
+        new = links.get(target) or links.get(unquote(target))
+        return match.group(1) + new if new else match.group(0)
+    return LINK_TARGET.sub(replace, markdown)
+
 def docx_to_html(docx_path):
+    from docx import Document  # only this legacy helper needs python-docx
     doc = Document(docx_path)
     html = ''
     for para in doc.paragraphs:
@@ -44,51 +255,413 @@ def docx_to_html(docx_path):
             html += f'<p>{para.text}</p>\n'
     return html
 
-def convert_file(file_path, output_folder):
+# WordprocessingML namespaces used by the streaming converter
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+R = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+MC = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+
+def _on(elem):
+    # <w:b/> means on; w:val="0"/"false"/"off" turns it off
+    return elem is not None and elem.get(W + 'val', 'true').lower() not in ('0', 'false', 'off', 'none')
+
+def _escape_md(text):
+    return text.replace('\\', '\\\\').replace('*', '\\*').replace('_', '\\_')
+
+def _read_part(zf, name):
+    try:
+        return ET.fromstring(zf.read(name))
+    except KeyError:
+        return None
+
+def _docx_styles(zf):
+    """Map paragraph styleId → (heading level or None, numPr (numId, ilvl) or None)."""
+    styles = {}
+    root = _read_part(zf, 'word/styles.xml')
+    for style in root.iter(W + 'style') if root is not None else ():
+        name_el = style.find(W + 'name')
+        name = (name_el.get(W + 'val') if name_el is not None else '').lower()
+        level = None
+        if name.startswith('heading'):
+            digits = ''.join(filter(str.isdigit, name))
+            level = int(digits) if digits else 1
+        elif name == 'title':
+            level = 1
+        num_pr = style.find(f'{W}pPr/{W}numPr')
+        numbering = None
+        if num_pr is not None and num_pr.find(W + 'numId') is not None:
+            ilvl = num_pr.find(W + 'ilvl')
+            numbering = (num_pr.find(W + 'numId').get(W + 'val'),
+                         int(ilvl.get(W + 'val')) if ilvl is not None else 0)
+        styles[style.get(W + 'styleId')] = (level, numbering)
+    return styles
+
+def _docx_numbering(zf):
+    """Map (numId, ilvl) → True if that list level is numbered rather than bulleted."""
+    root = _read_part(zf, 'word/numbering.xml')
+    if root is None:
+        return {}
+    formats = {}
+    for abstract in root.iter(W + 'abstractNum'):
+        for lvl in abstract.iter(W + 'lvl'):
+            fmt = lvl.find(W + 'numFmt')
+            fmt = fmt.get(W + 'val') if fmt is not None else 'bullet'
+            formats[(abstract.get(W + 'abstractNumId'), int(lvl.get(W + 'ilvl', 0)))] = fmt not in ('bullet', 'none')
+    ordered = {}
+    for num in root.iter(W + 'num'):
+        abstract_id = num.find(W + 'abstractNumId')
+        if abstract_id is None:
+            continue
+        for (aid, ilvl), is_ordered in formats.items():
+            if aid == abstract_id.get(W + 'val'):
+                ordered[(num.get(W + 'numId'), ilvl)] = is_ordered
+    return ordered
+
+def _docx_links(zf):
+    root = _read_part(zf, 'word/_rels/document.xml.rels')
+    if root is None:
+        return {}
+    return {rel.get('Id'): rel.get('Target') for rel in root.iter(PKG_REL + 'Relationship')
+            if rel.get('TargetMode') == 'External'}
+
+def _render_runs(segments):
+    """Join (text, bold, italic, raw) runs, merging neighbours with the same formatting."""
+    parts = []
+    i = 0
+    while i < len(segments):
+        _, bold, italic, _ = segments[i]
+        j = i
+        chunk = []
+        while j < len(segments) and segments[j][1:3] == (bold, italic):
+            text, _, _, raw = segments[j]
+            chunk.append(text if raw else _escape_md(text))
+            j += 1
+        text = ''.join(chunk)
+        marker = ('**' if bold else '') + ('*' if italic else '')
+        if marker and text.strip():
+            # Emphasis markers must hug the text, so keep outer spaces outside
+            core = text.strip()
+            lead = text[:len(text) - len(text.lstrip())]
+            trail = text[len(text.rstrip()):]
+            text = f'{lead}{marker}{core}{marker[::-1]}{trail}'
+        parts.append(text)
+        i = j
+    return ''.join(parts)
+
+def docx_to_markdown(zf, out):
+    """Stream word/document.xml from an open docx ZipFile and write Markdown to out.
+
+    Handles headings, bulleted/numbered lists (with nesting), tables, links
+    and inline bold/italic. Elements are cleared as soon as they've been
+    written, so memory stays bounded by the largest paragraph or table
+    rather than by the document.
+    """
+    styles = _docx_styles(zf)
+    ordered_lists = _docx_numbering(zf)
+    links = _docx_links(zf)
+
+    stack = []          # open elements, to find each element's parent
+    segments = []       # runs of the current paragraph
+    link_starts = []    # (segment index, url) for open hyperlinks
+    table = None        # rows of the outermost open table
+    table_depth = 0
+    hidden = 0          # inside a text box or a compatibility fallback copy
+    in_list = False
+
+    def write_block(text, list_item=False):
+        nonlocal in_list
+        if in_list and not list_item:
+            out.write('\n')
+        out.write(text + ('\n' if list_item else '\n\n'))
+        in_list = list_item
+
+    with zf.open('word/document.xml') as xml:
+        for event, elem in ET.iterparse(xml, events=('start', 'end')):
+            tag = elem.tag
+            if tag in (W + 'txbxContent', MC + 'Fallback'):
+                hidden += 1 if event == 'start' else -1
+            if event == 'start':
+                stack.append(elem)
+                if hidden:
+                    continue
+                if tag == W + 'hyperlink':
+                    link_starts.append((len(segments), links.get(elem.get(R + 'id'))))
+                elif tag == W + 'tbl':
+                    table_depth += 1
+                    if table_depth == 1:
+                        table = []
+                elif tag == W + 'tr' and table_depth == 1:
+                    table.append([])
+                elif tag == W + 'tc' and table_depth == 1:
+                    table[-1].append([])
+                continue
+
+            stack.pop()
+            if hidden:
+                pass
+            elif tag == W + 'r':
+                r_pr = elem.find(W + 'rPr')
+                bold = r_pr is not None and _on(r_pr.find(W + 'b'))
+                italic = r_pr is not None and _on(r_pr.find(W + 'i'))
+                for child in elem:
+                    if child.tag == W + 't' and child.text:
+                        segments.append((child.text, bold, italic, False))
+                    elif child.tag == W + 'tab':
+                        segments.append((' ', bold, italic, False))
+                    elif child.tag in (W + 'br', W + 'cr') and child.get(W + 'type') != 'page':
+                        segments.append(('\n', False, False, True))
+                elem.clear()
+            elif tag == W + 'hyperlink' and link_starts:
+                start, url = link_starts.pop()
+                inner = _render_runs(segments[start:])
+                del segments[start:]
+                if url and inner.strip():
+                    segments.append((f'[{inner}]({url})', False, False, True))
+                else:
+                    segments.append((inner, False, False, True))
+            elif tag == W + 'p':
+                text = _render_runs(segments).strip()
+                segments.clear()
+                p_pr = elem.find(W + 'pPr')
+                style_el = p_pr.find(W + 'pStyle') if p_pr is not None else None
+                level, numbering = styles.get(style_el.get(W + 'val') if style_el is not None else None, (None, None))
+                num_pr = p_pr.find(W + 'numPr') if p_pr is not None else None
+                if num_pr is not None and num_pr.find(W + 'numId') is not None:
+                    ilvl = num_pr.find(W + 'ilvl')
+                    numbering = (num_pr.find(W + 'numId').get(W + 'val'),
+                                 int(ilvl.get(W + 'val')) if ilvl is not None else 0)
+                if numbering and numbering[0] == '0':
+                    numbering = None  # numId 0 explicitly removes numbering
+                elem.clear()
+                if not text:
+                    continue
+                if table_depth:
+                    table[-1][-1].append(text)
+                elif level:
+                    write_block(f"{'#' * min(level, 6)} {text}")
+                elif numbering:
+                    bullet = '1.' if ordered_lists.get(numbering) else '-'
+                    write_block(f"{'  ' * numbering[1]}{bullet} {text}", list_item=True)
+                else:
+                    write_block(text)
+            elif tag == W + 'tbl':
+                table_depth -= 1
+                if table_depth == 0:
+                    rows = [['<br>'.join(cell).replace('\n', '<br>').replace('|', '\\|') for cell in row]
+                            for row in table if row]
+                    if rows:
+                        width = max(len(row) for row in rows)
+                        rows = [row + [''] * (width - len(row)) for row in rows]
+                        lines = [f"| {' | '.join(rows[0])} |", f"|{' --- |' * width}"]
+                        lines += [f"| {' | '.join(row)} |" for row in rows[1:]]
+                        write_block('\n'.join(lines))
+                    table = None
+
+            # Drop finished top-level blocks so the tree never grows with the document
+            if stack and stack[-1].tag == W + 'body':
+                stack[-1].clear()
+    if in_list:
+        out.write('\n')
+
+def md_path_for(file_path, output_folder):
+    name, _ = os.path.splitext(os.path.basename(file_path))
+    return os.path.join(output_folder, name + '.md')
+
+def write_atomic(path, data):
+    """Write str (as UTF-8) or bytes to path via a temporary file, so readers never see half of it."""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        if isinstance(data, str):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def assets_dir_for(md_path):
+    return os.path.splitext(md_path)[0] + '_assets'
+
+def convert_file(file_path, output_folder, assets=False):
+    """Convert one file; returns 'converted' or 'failed'.
+
+    With assets, the images embedded in a MIME export are saved to a
+    <name>_assets folder beside the .md and the Markdown links to them.
+    """
     filename = os.path.basename(file_path)
-    name, _ = os.path.splitext(filename)
-    md_filename = name + '.md'
-    md_path = os.path.join(output_folder, md_filename)
+    md_path = md_path_for(file_path, output_folder)
+    md_filename = os.path.basename(md_path)
 
-    # Handle docx
-    if is_zipfile(file_path):
+    # Handle docx (opened once, then streamed straight to Markdown)
+    try:
+        zf = zipfile.ZipFile(file_path, 'r')
+    except zipfile.BadZipFile:
+        zf = None
+    if zf is not None:
+        # Stream into a temporary file so a failure never leaves a truncated .md behind
+        tmp = f'{md_path}.{os.getpid()}.tmp'
         try:
-            html = docx_to_html(file_path)
-            markdown = md(html)
-            with open(md_path, 'w', encoding='utf-8') as f:
-                f.write(markdown)
+            with zf, open(tmp, 'w', encoding='utf-8') as f:
+                docx_to_markdown(zf, f)
+            os.replace(tmp, md_path)
             print(f'[docx] Converted: {filename} -> {md_filename}')
+            return 'converted'
         except Exception as e:
             print(f'[docx] Error processing {filename}: {e}')
-        return
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return 'failed'
 
     # Handle HTML MIME (Confluence etc)
     if is_html_mime(file_path):
-        html = extract_html_from_mime(file_path)
+        links = {}
+        if assets:
+            assets_dir = assets_dir_for(md_path)
+            html, links = extract_mime_assets(file_path, assets_dir, os.path.basename(assets_dir) + '/')
+        else:
+            html = extract_html_from_mime(file_path)
         if html:
+            # markdownify is only needed for MIME exports, so it is imported on first use
+            from markdownify import markdownify as md
             markdown = md(html)
-            with open(md_path, 'w', encoding='utf-8') as f:
-                f.write(markdown)
+            if links:
+                markdown = rewrite_links(markdown, links)
+            write_atomic(md_path, markdown)
             print(f'[html-mime] Converted: {filename} -> {md_filename}')
-        else:
-            print(f'[html-mime] Skipped: {filename} (No HTML found)')
-        return
+            return 'converted'
+        print(f'[html-mime] Skipped: {filename} (No HTML found)')
+        return 'failed'
 
     # Handle legacy .doc (binary, not supported)
     print(f'[legacy-doc] ERROR: {filename} appears to be a legacy Word .doc (binary) file. Skipped!')
+    return 'failed'
+
+def load_cache(output_folder):
+    try:
+        with open(os.path.join(output_folder, CACHE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(output_folder, cache):
+    path = os.path.join(output_folder, CACHE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(path + '.tmp', path)
+
+def cache_version(assets=False):
+    # Markdown written with --assets links elsewhere, so it is cached apart
+    return f'{CONVERTER_VERSION}+assets' if assets else CONVERTER_VERSION
+
+def convert_job(file_path, output_folder, cached=None, force=False, assets=False):
+    """Hash file_path and convert it unless cached (digest, version) still matches.
+
+    A file that is new to this output folder is first looked up in the
+    shared conversion cache (convert_cache.py) by its digest, unless force
+    or assets is set (the cache holds no images). Returns a summary record:
+    file, status ('converted'/'skipped'/'failed'), whether the Markdown came
+    from the shared cache, digest and seconds taken.
+    """
+    start = time.perf_counter()
+    record = {'file': os.path.basename(file_path), 'status': 'failed', 'cached': False, 'digest': None}
+    md_path = md_path_for(file_path, output_folder)
+    try:
+        with instrument.stage('hash'):
+            record['digest'] = convert_cache.file_digest(file_path)
+        if cached == [record['digest'], cache_version(assets)] and os.path.exists(md_path):
+            record['status'] = 'skipped'
+        else:
+            key = convert_cache.key('docx2md', CONVERTER_VERSION, record['digest'])
+            markdown = None if force or assets else convert_cache.get(key)
+            if markdown is not None:
+                with instrument.stage('write'):
+                    write_atomic(md_path, markdown)
+                print(f'[cache] Reused: {record["file"]} -> {os.path.basename(md_path)}')
+                record['status'] = 'converted'
+                record['cached'] = True
+            else:
+                with instrument.stage('convert'):
+                    record['status'] = convert_file(file_path, output_folder, assets)
+                if record['status'] == 'converted' and not assets and convert_cache.enabled():
+                    with open(md_path, 'rb') as f:
+                        convert_cache.put(key, f.read())
+    except Exception as e:
+        print(f'Error processing {record["file"]}: {e}')
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    if record['status'] == 'converted':
+        record['bytes_read'] = os.path.getsize(file_path)
+        record['bytes_written'] = os.path.getsize(md_path)
+        instrument.count(bytes_read=record['bytes_read'], bytes_written=record['bytes_written'], items=1)
+    instrument.task_done(file=file_path, status=record['status'])
+    return record
 
-def convert_folder(folder_path, output_folder=None):
+def convert_folder(folder_path, output_folder=None, workers=1, force=False, assets=False):
+    """Convert every .doc/.docx in folder_path, skipping unchanged files.
+
+    A cache in the output folder remembers each file's content digest and
+    the converter version it was converted with. Files are spread over
+    `workers` processes. Returns a summary dict with counts and per-file
+    records.
+    """
     if output_folder is None:
         output_folder = folder_path
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(('.doc', '.docx')):
-            file_path = os.path.join(folder_path, filename)
-            convert_file(file_path, output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+    cache = {} if force else load_cache(output_folder)
+    files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(('.doc', '.docx')))
+    jobs = [(os.path.join(folder_path, f), output_folder, cache.get(f), force, assets) for f in files]
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python docx2md.py <folder_path> [output_folder]")
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            records = list(pool.map(convert_job, *zip(*jobs), chunksize=4))
+        # Workers count in their own processes; total them up here too
+        for record in records:
+            if record['status'] == 'converted':
+                instrument.count(bytes_read=record['bytes_read'], bytes_written=record['bytes_written'], items=1)
     else:
-        folder = sys.argv[1]
-        out_folder = sys.argv[2] if len(sys.argv) > 2 else None
-        convert_folder(folder, out_folder)
\ No newline at end of file
+        records = [convert_job(*job) for job in jobs]
+
+    for record in records:
+        if record['status'] == 'converted':
+            cache[record['file']] = [record['digest'], cache_version(assets)]
+        elif record['status'] == 'failed':
+            cache.pop(record['file'], None)
+    save_cache(output_folder, cache)
+
+    counts = {status: sum(r['status'] == status for r in records) for status in ('converted', 'skipped', 'failed')}
+    counts['cached'] = sum(r['cached'] for r in records)
+    summary = dict(counts, seconds=round(time.perf_counter() - start, 3), files=records)
+    print(f"Converted {counts['converted']} ({counts['cached']} reused from the cache), "
+          f"skipped {counts['skipped']} unchanged, {counts['failed']} failed in {summary['seconds']:.1f}s")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a folder of .doc/.docx files to Markdown.")
+    parser.add_argument("folder", help="Folder containing .doc/.docx files")
+    parser.add_argument("output_folder", nargs="?", help="Where to write .md files (default: beside the originals)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reconvert every file, ignoring both the output folder's cache and the shared one")
+    parser.add_argument("--assets", action="store_true",
+                        help="Save the images inside MIME (Confluence) exports to <name>_assets and link to them")
+    parser.add_argument("--summary", help="Write a JSON summary of the run to this file ('-' for stdout)")
+    convert_cache.add_arguments(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    convert_cache.configure(args)
+
+    with instrument.session('docx2md', args):
+        summary = convert_folder(args.folder, args.output_folder, args.workers, args.force, args.assets)
+    if args.summary == '-':
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    elif args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,130 @@
 import sys
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image
 
-if len(sys.argv) < 2:
-    print("Usage: python3 extract_png_pages.py <input_file>")
-    sys.exit(1)
+import instrument
+from page_ranges import parse_pages
 
-input_file = sys.argv[1]
+FORMATS = {'png': 'png', 'jpeg': 'jpg', 'jpg': 'jpg', 'tiff': 'tif', 'webp': 'webp'}
 
-try:
-    im = Image.open(input_file)
-except FileNotFoundError:
-    print(f"File not found: {input_file}")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error opening file: {e}")
-    sys.exit(1)
+def save_frame(im, out_path, fmt, compress_level=6, quality=90):
+    if fmt in ('jpeg', 'jpg'):
+        # JPEG has no 1-bit or palette modes
+        frame = im.convert('L') if im.mode in ('1', 'L', 'I;16') else im.convert('RGB')
+        frame.save(out_path, 'JPEG', quality=quality)
+    elif fmt == 'webp':
+        im.convert('RGBA' if 'A' in im.mode else 'RGB').save(out_path, 'WEBP', quality=quality)
+    elif fmt == 'tiff':
+        # Group 4 is far smaller for bilevel fax pages; LZW for everything else
+        im.save(out_path, 'TIFF', compression='group4' if im.mode == '1' else 'tiff_lzw')
+    else:
+        im.save(out_path, 'PNG', compress_level=compress_level)
+
+# Per-process state, set up once by _init_worker
+_im = None
+_job = None
+
+def _init_worker(input_file, output_folder, fmt, compress_level, quality):
+    global _im, _job
+    _im = Image.open(input_file)
+    _job = (output_folder, fmt, compress_level, quality)
+
+def _close_worker():
+    # The serial path runs in the caller's process, which may be a long-lived office_tools server
+    global _im
+    if _im is not None:
+        _im.close()
+        _im = None
+
+def _extract_frames(frames):
+    output_folder, fmt, compress_level, quality = _job
+    saved = []
+    # Frames arrive in ascending runs, so each seek only moves forward
+    for i in frames:
+        with instrument.stage('decode'):
+            _im.seek(i)
+            _im.load()
+        out_path = os.path.join(output_folder, f"page_{i}.{FORMATS[fmt]}")
+        with instrument.stage('encode'):
+            save_frame(_im, out_path, fmt, compress_level, quality)
+        saved.append(out_path)
+        instrument.count(bytes_written=os.path.getsize(out_path), items=1)
+        instrument.task_done(frame=i + 1)
+    return saved
+
+def extract_pages(input_file, output_folder='.', frames=None, fmt='png', compress_level=6, quality=90, workers=1):
+    """Save the given frames (0-based, default all) of a multi-page image as separate files.
+
+    Frames are split into contiguous ranges, one batch per task, and each
+    worker process opens its own handle on the input. Returns saved paths.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if frames is None:
+        with Image.open(input_file) as im:
+            frames = list(range(getattr(im, 'n_frames', 1)))
+
+    instrument.count(bytes_read=os.path.getsize(input_file))
+    job = (input_file, output_folder, fmt, compress_level, quality)
+    if workers <= 1 or len(frames) <= 1:
+        _init_worker(*job)
+        try:
+            saved = _extract_frames(frames)
+        finally:
+            _close_worker()
+        for out_path in saved:
+            print(f"Saved {out_path}")
+        return saved
+
+    # A few contiguous ranges per worker keeps seeks short and cores busy
+    size = max(1, len(frames) // (workers * 4))
+    chunks = [frames[i:i + size] for i in range(0, len(frames), size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=job) as pool:
+        futures = [pool.submit(_extract_frames, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for out_path in future.result():
+                print(f"Saved {out_path}")
+        saved = [out_path for future in futures for out_path in future.result()]
+    # Workers count in their own processes; total them up here too
+    instrument.count(items=len(saved), bytes_written=sum(os.path.getsize(p) for p in saved))
+    return saved
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a multi-page image (e.g. TIFF) into one file per page.")
+    parser.add_argument("input_file", help="Multi-page image to split")
+    parser.add_argument("-o", "--output-dir", default=".", help="Folder for the pages (default: current folder)")
+    parser.add_argument("--frames", help="Pages to extract, 1-based, e.g. '1-5,8,10-' (default: all)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png", help="Output format (default: png)")
+    parser.add_argument("--compress-level", type=int, default=6, choices=range(10), metavar="0-9",
+                        help="PNG compression level; lower is faster, higher is smaller (default: 6)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality, 1-100 (default: 90)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    input_file = args.input_file
+    try:
+        with Image.open(input_file) as im:
+            frame_count = getattr(im, 'n_frames', 1)
+    except FileNotFoundError:
+        print(f"File not found: {input_file}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error opening file: {e}")
+        sys.exit(1)
 
-i = 0
-while True:
     try:
-        im.seek(i)
-        im.save(f"page_{i}.png")
-        print(f"Saved page_{i}.png")
-        i += 1
-    except EOFError:
-        print("Done extracting all pages.")
-        break
+        frames = parse_pages(args.frames, frame_count, 'frame')
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    with instrument.session('extract_pages', args):
+        extract_pages(input_file, args.output_dir, frames, args.format, args.compress_level, args.quality,
+                      args.workers)
+    print("Done extracting all pages.")
+
+if __name__ == '__main__':
+    main()
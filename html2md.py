@@ -1,68 +1,474 @@
 import sys
 import os
+import re
+from html import unescape
+import argparse
 import logging
-from bs4 import BeautifulSoup
+from collections import Counter
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
+from bs4.dammit import EntitySubstitution
+
+import instrument
+import convert_cache
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
+# Bump whenever conversion output changes so cached results are redone
+CONVERTER_VERSION = 2
+LISTS = {'ul', 'ol'}
+HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# Blocks whose text (including nested inline tags) becomes one Markdown block
+LEAVES = HEADINGS | {'p', 'li', 'pre', 'dt', 'dd', 'caption', 'tr'}
+CELLS = {'td', 'th'}
+# Block containers that only separate paragraphs of loose text
+BREAKS = {'html', 'body', 'div', 'section', 'article', 'main', 'header', 'footer', 'nav', 'aside',
+          'figure', 'figcaption', 'form', 'fieldset', 'address', 'details', 'summary', 'center', 'dl', 'br'}
+BLOCKS = LISTS | LEAVES | BREAKS | {'blockquote', 'table', 'hr'}
+SKIP = {'head', 'title', 'script', 'style', 'template', 'noscript'}
+TEXT_TYPES = (NavigableString, CData)
+# Elements that never have content, closed as soon as they open (as BeautifulSoup does)
+VOID = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+        'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+        'nextid', 'spacer'}
+CHUNK_SIZE = 1024 * 1024
+CELL = object()  # marks a cell boundary among a table row's words
+CHARREF_DIGITS = {10: re.compile('^([0-9]+)(.*)'), 16: re.compile('^([0-9a-f]+)(.*)')}
+
 def extract_clean_text(tag):
     # Join all strings inside tag (including nested), with a space, and collapse whitespace
     text = " ".join(tag.stripped_strings)
     return " ".join(text.split())
 
+class _Block:
+    __slots__ = ('name', 'kind', 'words', 'depth', 'group', 'quote', 'ordered', 'count', 'marker', 'held')
+
+    def __init__(self, name, kind, parent=None):
+        self.name = name
+        self.kind = kind  # root, list, quote, table, leaf or para (loose text)
+        self.words = []
+        self.depth = parent.depth if parent else 0  # list nesting
+        self.group = parent.group if parent else None  # blocks in one group are not separated by blank lines
+        self.quote = parent.quote if parent else 0
+        self.ordered = False
+        self.count = 0
+        self.marker = None
+        self.held = None  # a list item's nested output, written after its own line
+
+class MarkdownWriter:
+    """Turn a stream of start/text/end events into Markdown, one block at a time.
+
+    Every start() must be matched by an end(). Output goes to `write` as soon
+    as each block is complete, so only the open blocks are held in memory.
+    A list item's line holds all of its text, including text after a nested
+    list, so an item with nested lists is written when it closes, followed
+    by the nested items held back until then.
+    """
+
+    def __init__(self, write, indent=0):
+        self.write = write
+        self.indent = indent
+        self.stack = [_Block(None, 'root')]
+        self.opened = []  # per open element: did it open a block?
+        self.skipping = 0
+        self.started = False
+        self.last_group = None
+        self.last_quote = 0
+        self.holding = []  # open list items holding back their nested output
+
+    def start(self, name, ordered=None):
+        if self.skipping or name in SKIP:
+            self.skipping += 1
+            return
+        top = self.stack[-1]
+        if top.kind == 'para' and name in BLOCKS:
+            self._close()
+            top = self.stack[-1]
+
+        if top.kind == 'leaf' and not (name in LISTS and top.name != 'pre'):
+            # Inline inside a block: its text joins the block's line
+            if name in CELLS and top.name == 'tr':
+                top.words.append(CELL)
+            elif name == 'br' and top.name == 'pre':
+                top.words.append('\n')
+            self.opened.append(False)
+            return
+
+        if name in LISTS:
+            if top.name == 'li' and top.held is None:
+                top.held = []
+                self.holding.append(top)
+            block = _Block(name, 'list', top)
+            block.ordered = name == 'ol' if ordered is None else ordered
+            block.depth += 1
+            if block.depth == 1:
+                block.group = block
+        elif name in LEAVES:
+            block = _Block(name, 'leaf', top)
+            if name == 'li':
+                if top.kind == 'list':
+                    top.count += 1
+                    block.marker = f"{top.count}." if top.ordered else '-'
+                else:
+                    block.marker = '-'
+            elif name == 'tr':
+                block.group = top if top.kind == 'table' else None
+        elif name == 'blockquote':
+            block = _Block(name, 'quote', top)
+            block.quote += 1
+        elif name == 'table':
+            block = _Block(name, 'table', top)
+        else:
+            if name == 'hr':
+                self._emit('---', top)
+            self.opened.append(False)
+            return
+        self.stack.append(block)
+        self.opened.append(True)
+
+    def text(self, text):
+        if self.skipping:
+            return
+        top = self.stack[-1]
+        if top.name == 'pre':
+            top.words.append(text)
+            return
+        words = text.split()
+        if not words:
+            return
+        if top.kind in ('root', 'quote'):
+            top = _Block(None, 'para', top)
+            self.stack.append(top)
+        elif top.kind not in ('leaf', 'para'):
+            return  # stray text between list items or table rows
+        top.words.extend(words)
+
+    def end(self, name):
+        if self.skipping:
+            self.skipping -= 1
+            return
+        if self.stack[-1].kind == 'para' and (name in BREAKS or self.opened[-1]):
+            self._close()
+        if self.opened.pop():
+            self._close()
+
+    def close(self):
+        while len(self.stack) > 1:
+            self._close()
+        if self.started:
+            self.write('\n')
+
+    def _indent(self, block):
+        return ' ' * (self.indent + 2 * max(block.depth - 1, 0))
+
+    def _emit(self, text, block, tight=False):
+        if self.holding:
+            self.holding[-1].held.append((text, block, tight))
+            return
+        group = block.group if tight else None
+        if self.started:
+            if group is not None and group is self.last_group:
+                self.write('\n')
+            else:
+                # Keep consecutive blocks of one blockquote in the same quote
+                self.write('\n' + '>' * min(block.quote, self.last_quote) + '\n')
+        if block.quote:
+            prefix = '> ' * block.quote
+            text = '\n'.join(prefix + line for line in text.split('\n'))
+        self.write(text)
+        self.started = True
+        self.last_group = group
+        self.last_quote = block.quote
+
+    def _release(self, held):
+        if self.holding:
+            # Still inside an outer held item: pass the whole list up instead of copying it
+            self.holding[-1].held.append(held)
+            return
+        stack = [iter(held)]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+            elif type(entry) is list:
+                stack.append(iter(entry))
+            else:
+                self._emit(*entry)
+
+    def _close(self):
+        block = self.stack.pop()
+        name, words = block.name, block.words
+        if block.kind == 'para':
+            self._emit(' '.join(words), block)
+        elif block.kind != 'leaf':
+            return
+        elif name == 'li':
+            if block.held is not None:
+                self.holding.pop()
+            self._emit(f"{self._indent(block)}{block.marker} {' '.join(words)}", block, tight=True)
+            if block.held:
+                self._release(block.held)
+        elif name == 'pre':
+            code = ''.join(words)
+            code = code[1:] if code.startswith('\n') else code
+            if code.strip():
+                self._emit(f"```\n{code.rstrip()}\n```", block)
+        elif name == 'tr':
+            cells = []
+            for word in words:
+                if word is CELL:
+                    cells.append([])
+                elif cells:
+                    cells[-1].append(word)
+            if cells:
+                row = '| ' + ' | '.join(' '.join(cell).replace('|', '\\|') for cell in cells) + ' |'
+                table = block.group
+                if table is not None:
+                    if not table.count:
+                        row += '\n|' + ' --- |' * len(cells)
+                    table.count += 1
+                self._emit(row, block, tight=True)
+        elif words:
+            text = ' '.join(words)
+            if name in HEADINGS:
+                text = '#' * int(name[1]) + ' ' + text
+            elif name == 'dd':
+                text = ': ' + text
+            self._emit(text, block)
+
+def walk(root, writer):
+    """Feed root and everything under it to writer, in document order, without recursion."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if type(node) is tuple:
+            writer.end(node[0])
+        elif isinstance(node, Tag):
+            writer.start(node.name)
+            stack.append((node.name,))
+            stack.extend(reversed(node.contents))
+        elif type(node) in TEXT_TYPES:
+            writer.text(node)
+
+def html_to_markdown(root, indent=0):
+    """Convert every list and block under root (a soup or tag) to Markdown.
+
+    Runs in time linear in the size of the tree and leaves the tree untouched.
+    """
+    out = []
+    writer = MarkdownWriter(out.append, indent)
+    walk(root, writer)
+    writer.close()
+    return ''.join(out)
+
 def html_list_to_markdown(tag, indent=0, ordered=False):
-    markdown = ""
-    for idx, li in enumerate(tag.find_all('li', recursive=False)):
-        sublists = li.find_all(['ul', 'ol'], recursive=False)
-        # Temporarily remove sublists so they don't pollute the text
-        for sublist in sublists:
-            sublist.extract()
-        line = extract_clean_text(li)
-        bullet = f"{' ' * indent}{str(idx + 1) + '.' if ordered else '-'} {line}"
-        markdown += f"{bullet}\n"
-        # Now add back nested lists (and process them)
-        for sublist in sublists:
-            markdown += html_list_to_markdown(
-                sublist,
-                indent=indent + 2,
-                ordered=(sublist.name == "ol")
-            )
-    return markdown
+    out = []
+    writer = MarkdownWriter(out.append, indent)
+    writer.start(tag.name, ordered)
+    for child in tag.contents:
+        walk(child, writer)
+    writer.end(tag.name)
+    writer.close()
+    return ''.join(out)
+
+def resolve_charref(name):
+    """The text BeautifulSoup's html.parser builder makes of &#name; (name without '&#' and ';').
+
+    Like html.unescape, but keeps control characters and noncharacters, as
+    BeautifulSoup does, instead of dropping them.
+    """
+    base = 16 if name[:1] in ('x', 'X') else 10
+    digits = name[1:] if base == 16 else name
+    extra = ''
+    try:
+        number = int(digits, base)
+    except ValueError:
+        # Digits followed by other text: only the digits are the reference
+        match = CHARREF_DIGITS[base].search(digits)
+        if match is None:
+            return digits
+        number, extra = int(match.group(1), base), match.group(2)
+    if number == 0 or number > 0x10ffff or 0xd800 <= number <= 0xdfff:
+        return '\ufffd' + extra
+    if 0x80 <= number <= 0x9f:
+        # Windows-1252 code points written as references
+        return unescape(f'&#{number};') + extra
+    return chr(number) + extra
+
+class StreamingConverter(HTMLParser):
+    """Feed HTML in pieces and get Markdown out as each block closes.
+
+    Mirrors how BeautifulSoup's html.parser builder nests tags (void elements
+    close at once and a later end tag for one is dropped, an end tag closes
+    everything opened after its start tag, other stray end tags are ignored)
+    and resolves character references, so the output matches
+    html_to_markdown() while memory only grows with nesting depth and the
+    current block.
+    """
+
+    def __init__(self, writer):
+        # Character references are resolved below, the way BeautifulSoup does
+        super().__init__(convert_charrefs=False)
+        self.writer = writer
+        self.open_tags = []
+        self.open_counts = {}
+        self.closed_voids = Counter()  # void elements, by name, whose end tag, if any, is still to come
+        self.pending = []  # text arrives in pieces; words may straddle them
+
+    def _flush_text(self):
+        if self.pending:
+            self.writer.text(''.join(self.pending))
+            self.pending = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        self.writer.start(tag)
+        if tag in VOID:
+            self.writer.end(tag)
+            self.closed_voids[tag] += 1
+        else:
+            self.open_tags.append(tag)
+            self.open_counts[tag] = self.open_counts.get(tag, 0) + 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush_text()
+        self.writer.start(tag)
+        self.writer.end(tag)
+
+    def handle_endtag(self, tag):
+        if self.closed_voids[tag]:
+            # BeautifulSoup drops it without even ending the current text (<br>b</br>c is "bc")
+            self.closed_voids[tag] -= 1
+            return
+        self._flush_text()
+        if not self.open_counts.get(tag):
+            return
+        while True:
+            name = self.open_tags.pop()
+            self.open_counts[name] -= 1
+            self.writer.end(name)
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_entityref(self, name):
+        # Unknown names stay literal, without their semicolon
+        self.pending.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, '&' + name))
+
+    def handle_charref(self, name):
+        self.pending.append(resolve_charref(name))
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def unknown_decl(self, data):
+        self._flush_text()
+        if data.upper().startswith('CDATA['):
+            self.writer.text(data[6:])
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self.open_tags:
+            self.writer.end(self.open_tags.pop())
+        self.writer.close()
+
+def stream_html_to_markdown(src, write, chunk_size=CHUNK_SIZE):
+    """Convert HTML read from the text file src, passing Markdown to write as it is produced."""
+    parser = StreamingConverter(MarkdownWriter(write))
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+    parser.close()
+
+def convert_html_to_markdown_streaming(file_path):
+    out_file = os.path.splitext(file_path)[0] + '.md'
+    # A page that fails partway (e.g. on bytes that are not UTF-8) must not leave half a .md behind
+    tmp = f"{out_file}.{os.getpid()}.tmp"
+    try:
+        # Reading, parsing, converting and writing are interleaved, so they are one stage
+        with instrument.stage('convert'):
+            # Strict UTF-8 with universal newlines, exactly as convert_cache.decode_text reads it in tree mode
+            with open(file_path, encoding='utf-8') as src, open(tmp, 'w', encoding='utf-8') as dst:
+                stream_html_to_markdown(src, dst.write)
+        if not os.path.getsize(tmp):
+            logging.info("No text found in HTML.")
+            return
+        os.replace(tmp, out_file)
+        instrument.count(bytes_read=os.path.getsize(file_path), bytes_written=os.path.getsize(out_file), items=1)
+        logging.info(f"Markdown written to {out_file}")
+    except Exception as e:
+        logging.error(f"Failed to convert {file_path}: {e}")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 def convert_html_to_markdown(file_path):
     try:
-        with open(file_path, encoding='utf-8') as f:
-            html = f.read()
+        with instrument.stage('read'):
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            html = convert_cache.decode_text(data)
     except Exception as e:
         logging.error(f"Failed to read file: {e}")
         return
+    instrument.count(bytes_read=len(data), items=1)
 
-    soup = BeautifulSoup(html, 'html.parser')
-    lists = soup.find_all(['ul', 'ol'])
-    if not lists:
-        logging.info("No lists found in HTML.")
+    # Pages seen before (same bytes, same converter) come from the shared conversion cache
+    key = convert_cache.key('html2md', CONVERTER_VERSION, convert_cache.digest_bytes(data))
+    cached = convert_cache.get(key)
+    if cached is not None:
+        output_md = cached.decode('utf-8')
+    else:
+        with instrument.stage('parse'):
+            soup = BeautifulSoup(html, 'html.parser')
+        with instrument.stage('convert'):
+            output_md = html_to_markdown(soup)
+        convert_cache.put(key, output_md.encode('utf-8'))
+    if not output_md:
+        logging.info("No text found in HTML.")
         return
 
-    output_md = ""
-    for tag in lists:
-        is_ordered = tag.name == "ol"
-        output_md += html_list_to_markdown(tag, indent=0, ordered=is_ordered)
-        break  # Remove this if you want to process all lists
-
     out_file = os.path.splitext(file_path)[0] + '.md'
     try:
-        with open(out_file, 'w', encoding='utf-8') as f:
-            f.write(output_md)
+        with instrument.stage('write'):
+            with open(out_file, 'w', encoding='utf-8') as f:
+                f.write(output_md)
+        instrument.count(bytes_written=os.path.getsize(out_file))
         logging.info(f"Markdown written to {out_file}")
     except Exception as e:
         logging.error(f"Failed to write Markdown file: {e}")
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        logging.error("Usage: python html2md.py inputfile.html")
-        sys.exit(1)
-    file_path = sys.argv[1]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an HTML file to Markdown (written next to it as .md).")
+    parser.add_argument("input_file", help="HTML file to convert")
+    parser.add_argument("--stream", action="store_true",
+                        help="Convert while reading instead of loading the whole page first; "
+                             "use for very large files (not cached)")
+    convert_cache.add_arguments(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    convert_cache.configure(args)
+
+    file_path = args.input_file
     if not os.path.exists(file_path):
         logging.error(f"File does not exist: {file_path}")
         sys.exit(1)
-    convert_html_to_markdown(file_path)
+    with instrument.session('html2md', args):
+        if args.stream:
+            convert_html_to_markdown_streaming(file_path)
+        else:
+            convert_html_to_markdown(file_path)
+
+if __name__ == '__main__':
+    main()
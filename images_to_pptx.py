@@ -1,80 +1,256 @@
 import os
 import sys
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from PIL import Image
+from PIL import Image, ImageOps, ExifTags
+
+import instrument
 
 # PowerPoint 16:9 slide size
 SLIDE_WIDTH = Inches(13.33)
 SLIDE_HEIGHT = Inches(7.5)
 TITLE_HEIGHT = Inches(1.0)
+EMU_PER_INCH = Inches(1)
 
 def is_image_file(filename):
     return filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'))
 
-def create_pptx_from_images(image_folder, output_file):
+def fit_image(img_width, img_height):
+    """Return (left, top, width, height) placing an image of this size under the title."""
+    img_ratio = img_width / img_height
+
+    # Define max area for image under title
+    max_width = SLIDE_WIDTH - Inches(1)
+    max_height = SLIDE_HEIGHT - TITLE_HEIGHT - Inches(0.5)
+    max_ratio = max_width / max_height
+
+    if img_ratio > max_ratio:
+        # Image is wider than the box
+        display_width = max_width
+        display_height = max_width / img_ratio
+    else:
+        # Image is taller than the box
+        display_height = max_height
+        display_width = max_height * img_ratio
+
+    image_left = (SLIDE_WIDTH - display_width) / 2
+    image_top = TITLE_HEIGHT + Inches(0.2) + ((max_height - display_height) / 2)
+    return image_left, image_top, display_width, display_height
+
+def prepare_image(image_path, cache_dir, dpi=150, fmt='auto', quality=85):
+    """Downscale and re-encode one image for its slide, caching the result.
+
+    The image is shrunk to its displayed size at `dpi` (never enlarged) and
+    saved without metadata as JPEG, or PNG when it has transparency or
+    fmt='png'. Photos are first turned upright by their EXIF orientation,
+    since that tag is dropped with the rest of the metadata. Results are
+    cached in cache_dir by content hash and settings. Returns (path to
+    embed, size as displayed).
+    """
+    try:
+        return _prepare_image(image_path, cache_dir, dpi, fmt, quality)
+    finally:
+        instrument.task_done(file=image_path)
+
+def _prepare_image(image_path, cache_dir, dpi, fmt, quality):
+    with instrument.stage('hash'), open(image_path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+    with Image.open(image_path) as img:
+        # Animated GIFs would lose their frames
+        if getattr(img, 'is_animated', False):
+            return image_path, img.size
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+        # Orientations 5-8 turn the picture on its side
+        size = img.size[::-1] if orientation in (5, 6, 7, 8) else img.size
+        _, _, display_width, display_height = fit_image(*size)
+        target = (max(1, round(display_width / EMU_PER_INCH * dpi)),
+                  max(1, round(display_height / EMU_PER_INCH * dpi)))
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        ext = 'png' if fmt == 'png' or (fmt == 'auto' and has_alpha) else 'jpg'
+        # Small upright JPEG/PNGs gain nothing from re-encoding
+        if size[0] <= target[0] and img.format in ('JPEG', 'PNG') and orientation == 1:
+            return image_path, size
+
+        rotated = f"_o{orientation}" if orientation != 1 else ""
+        cached = os.path.join(cache_dir, f"{digest}_{target[0]}x{target[1]}_q{quality}{rotated}.{ext}")
+        if os.path.exists(cached):
+            return cached, size
+
+        if orientation != 1:
+            img = ImageOps.exif_transpose(img)
+        if size[0] > target[0]:
+            with instrument.stage('resize'):
+                img = img.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        if ext == 'jpg':
+            img = img.convert('RGB')
+            options = {'quality': quality, 'optimize': True}
+        else:
+            if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+                img = img.convert('RGBA')
+            options = {'optimize': True}
+        # Write under a temporary name so a concurrent run never sees half a file
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        with instrument.stage('encode'):
+            img.save(tmp, 'JPEG' if ext == 'jpg' else 'PNG', **options)
+        os.replace(tmp, cached)
+    return cached, size
+
+def _prepare(args):
+    image_path, cache_dir, dpi, fmt, quality = args
+    try:
+        return prepare_image(image_path, cache_dir, dpi, fmt, quality), None
+    except Exception as e:
+        return None, e
+
+def new_presentation():
     prs = Presentation()
     prs.slide_width = SLIDE_WIDTH
     prs.slide_height = SLIDE_HEIGHT
+    return prs
+
+def add_titled_slide(prs, title):
+    """Add a blank slide with title across the top; returns the slide."""
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # Blank slide
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(0.2), SLIDE_WIDTH - Inches(1), TITLE_HEIGHT)
+    title_frame = title_box.text_frame
+    title_frame.text = title
+    title_frame.paragraphs[0].font.size = Pt(24)
+    return slide
+
+def place_image(slide, image, img_width, img_height):
+    """Add image (a path or binary file object) of this pixel size to slide, fitted under the title."""
+    image_left, image_top, display_width, display_height = fit_image(img_width, img_height)
+    with instrument.stage('add_picture'):
+        slide.shapes.add_picture(image, image_left, image_top, width=display_width, height=display_height)
+
+def part_name(output_file, number):
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{number:03d}{ext or '.pptx'}"
+
+def create_pptx_from_images(image_folder, output_file, optimize=False, dpi=150, fmt='auto', quality=85,
+                            workers=1, cache_dir=None, max_slides=None, max_mb=None):
+    """Build a deck with one titled slide per image in image_folder.
+
+    With optimize=True images are first downscaled to their displayed size
+    and re-encoded in `workers` processes (see prepare_image), which keeps
+    large photo decks small and quick to save.
+
+    With max_slides and/or max_mb the deck is split into numbered parts
+    (deck_001.pptx, deck_002.pptx, ...). Each part is saved and released
+    as soon as it is full, so memory stays bounded by one part however
+    many slides there are. Returns the list of files written.
+    """
+    split = bool(max_slides or max_mb)
+    max_bytes = max_mb * 1024 * 1024 if max_mb else None
+    prs = new_presentation()
+    part_slides = 0
+    part_bytes = 0
+    saved = []
+    slide_times = []
+
+    def save_part():
+        path = part_name(output_file, len(saved) + 1) if split else output_file
+        with instrument.stage('save'):
+            prs.save(path)
+        instrument.count(bytes_written=os.path.getsize(path))
+        saved.append(path)
+        print(f"Presentation saved to: {path}")
 
     images = sorted([f for f in os.listdir(image_folder) if is_image_file(f)])
 
     if not images:
         print("No image files found in the folder.")
-        return
+        return []
+
+    prepared = {}
+    if optimize:
+        cache_dir = cache_dir or os.path.join(image_folder, '.pptx_cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        jobs = [(os.path.join(image_folder, f), cache_dir, dpi, fmt, quality) for f in images]
+        with instrument.stage('prepare'):
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_prepare, jobs, chunksize=4))
+            else:
+                results = [_prepare(job) for job in jobs]
+        prepared = dict(zip(images, results))
 
     for image_file in images:
         image_path = os.path.join(image_folder, image_file)
-        slide = prs.slides.add_slide(prs.slide_layouts[6])  # Blank slide
+        if optimize and prepared[image_file][0]:
+            image_path = prepared[image_file][0][0]
+        image_bytes = os.path.getsize(image_path) if os.path.exists(image_path) else 0
+        if part_slides and ((max_slides and part_slides >= max_slides) or
+                            (max_bytes and part_bytes + image_bytes > max_bytes)):
+            save_part()
+            prs = new_presentation()  # drop the saved part and its image blobs
+            part_slides = part_bytes = 0
+        part_slides += 1
+        part_bytes += image_bytes
 
-        # Title box (filename, no extension)
-        title_box = slide.shapes.add_textbox(Inches(0.5), Inches(0.2), SLIDE_WIDTH - Inches(1), TITLE_HEIGHT)
-        title_frame = title_box.text_frame
-        title_frame.text = os.path.splitext(image_file)[0]
-        title_frame.paragraphs[0].font.size = Pt(24)
+        start = time.perf_counter()
+        # Title is the filename, no extension
+        slide = add_titled_slide(prs, os.path.splitext(image_file)[0])
 
         # Load image and calculate placement/size
         try:
-            img = Image.open(image_path)
-            img_width, img_height = img.size
-            img_ratio = img_width / img_height
-
-            # Define max area for image under title
-            max_width = SLIDE_WIDTH - Inches(1)
-            max_height = SLIDE_HEIGHT - TITLE_HEIGHT - Inches(0.5)
-            max_ratio = max_width / max_height
-
-            if img_ratio > max_ratio:
-                # Image is wider than the box
-                display_width = max_width
-                display_height = max_width / img_ratio
+            if optimize:
+                result, error = prepared[image_file]
+                if error:
+                    raise error
+                image_path, (img_width, img_height) = result
             else:
-                # Image is taller than the box
-                display_height = max_height
-                display_width = max_height * img_ratio
-
-            image_left = (SLIDE_WIDTH - display_width) / 2
-            image_top = TITLE_HEIGHT + Inches(0.2) + ((max_height - display_height) / 2)
-
-            slide.shapes.add_picture(image_path, image_left, image_top,
-                                     width=display_width, height=display_height)
+                img = Image.open(image_path)
+                img_width, img_height = img.size
+            place_image(slide, image_path, img_width, img_height)
+            instrument.count(bytes_read=image_bytes, items=1)
         except Exception as e:
             print(f"Error processing {image_file}: {e}")
             continue
+        finally:
+            slide_times.append(time.perf_counter() - start)
 
-    prs.save(output_file)
-    print(f"Presentation saved to: {output_file}")
+    save_part()
+    peak = instrument.peak_rss_mb()
+    print(f"{len(slide_times)} slides in {len(saved)} file(s): "
+          f"{sum(slide_times) / len(slide_times) * 1000:.1f} ms/slide on average, "
+          f"slowest {max(slide_times) * 1000:.1f} ms"
+          + (f"; peak memory {peak:.0f} MB" if peak is not None else ""))
+    return saved
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python3 images_to_pptx.py <image_folder> <output.pptx>")
-        sys.exit(1)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn a folder of images into a PowerPoint deck.")
+    parser.add_argument("image_folder", help="Folder containing the images")
+    parser.add_argument("output_pptx", help="Presentation to write (.pptx)")
+    parser.add_argument("--optimize", action="store_true",
+                        help="Downscale and re-encode images to their on-slide size first")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolution of optimized images (default: 150)")
+    parser.add_argument("--format", choices=["auto", "jpeg", "png"], default="auto",
+                        help="Encoding for optimized images; auto keeps PNG only for transparency (default: auto)")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality for optimized images (default: 85)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for --optimize (default: number of CPUs)")
+    parser.add_argument("--cache-dir", help="Where optimized images are cached (default: <image_folder>/.pptx_cache)")
+    parser.add_argument("--max-slides", type=int,
+                        help="Split into numbered decks (name_001.pptx, ...) of at most this many slides")
+    parser.add_argument("--max-mb", type=float,
+                        help="Split into numbered decks holding at most this many MB of images each")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
 
-    image_dir = sys.argv[1]
-    output_pptx = sys.argv[2]
-
-    if not os.path.isdir(image_dir):
-        print(f"Error: {image_dir} is not a directory.")
+    if not os.path.isdir(args.image_folder):
+        print(f"Error: {args.image_folder} is not a directory.")
         sys.exit(1)
 
-    create_pptx_from_images(image_dir, output_pptx)
+    with instrument.session('images_to_pptx', args):
+        create_pptx_from_images(args.image_folder, args.output_pptx, args.optimize, args.dpi,
+                                args.format, args.quality, args.workers, args.cache_dir,
+                                args.max_slides, args.max_mb)
+
+if __name__ == "__main__":
+    main()
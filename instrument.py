@@ -0,0 +1,172 @@
+"""
+Shared --stats / --profile instrumentation for the office tools.
+
+Scripts wrap their work in named stages and count what they process:
+
+    with instrument.stage('parse'):
+        soup = BeautifulSoup(html, 'html.parser')
+    instrument.count(bytes_read=len(html), items=1)
+    instrument.task_done(file=path)
+
+With --stats PATH every finished unit of work (a file, a page, ...) is
+appended to PATH as one JSON line ("event": "task") with its stage timings,
+byte and item counts and the peak RSS of the process that did it. At the
+end of the run a "summary" line holds the wall time, the byte and item
+totals, the stage timings of the main process and the peak RSS of the main
+process and of its largest worker. Worker processes find the stats file
+through the environment, so pools need no extra plumbing; their stage
+timings are in their task lines.
+
+With --profile PATH the main process runs under cProfile and the stats are
+dumped to PATH (python3 -m pstats PATH).
+
+Without either option the calls only keep a few running totals.
+"""
+
+import os
+import sys
+import json
+import time
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STATS_ENV = 'OFFICE_TOOLS_STATS'
+TOOL_ENV = 'OFFICE_TOOLS_TOOL'
+
+def maxrss_mb(rusage):
+    """The peak RSS in MB recorded in a getrusage() or os.wait4() result."""
+    # macOS reports bytes, Linux kilobytes
+    peak = rusage.ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def peak_rss_mb(who='self'):
+    if resource is None:
+        return None
+    return round(maxrss_mb(resource.getrusage(resource.RUSAGE_CHILDREN if who == 'children'
+                                              else resource.RUSAGE_SELF)), 1)
+
+class Stats:
+    """Stage timings and counters for one process, for the current task and the whole run."""
+
+    def __init__(self, tool, path=None):
+        self.tool = tool
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.task_stages = {}
+        self.task_counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            self.task_stages[name] = self.task_stages.get(name, 0.0) + elapsed
+
+    def count(self, **counters):
+        for key, value in counters.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+            self.task_counts[key] = self.task_counts.get(key, 0) + value
+
+    def emit(self, event, **fields):
+        if not self.path:
+            return
+        record = {'tool': self.tool, 'event': event, 'pid': os.getpid(), 'time': round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record) + '\n'
+        if self.path == '-':
+            sys.stderr.write(line)
+        else:
+            # One short append per line, so lines from several workers never interleave
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def task_done(self, **fields):
+        """Emit the current task's timings and counters, then start a new task."""
+        self.emit('task', stages=_rounded(self.task_stages), **self.task_counts, peak_rss_mb=peak_rss_mb(),
+                  **fields)
+        self.task_stages = {}
+        self.task_counts = {}
+
+    def summary(self, **fields):
+        self.emit('summary', wall_s=round(time.perf_counter() - self.started, 4), stages=_rounded(self.stages),
+                  **self.counts, peak_rss_mb=peak_rss_mb(), peak_worker_rss_mb=peak_rss_mb('children'),
+                  **fields)
+
+def _rounded(stages):
+    return {name: round(seconds, 4) for name, seconds in stages.items()}
+
+_current = None
+
+def current():
+    """This process's collector; in pool workers it picks up the main process's --stats."""
+    global _current
+    if _current is None:
+        _current = Stats(os.environ.get(TOOL_ENV, os.path.basename(sys.argv[0])), os.environ.get(STATS_ENV))
+    return _current
+
+def _forget():
+    global _current
+    _current = None
+
+if hasattr(os, 'register_at_fork'):
+    # A forked worker starts its own collector instead of inheriting the parent's totals
+    os.register_at_fork(after_in_child=_forget)
+
+def stage(name):
+    return current().stage(name)
+
+def count(**counters):
+    current().count(**counters)
+
+def task_done(**fields):
+    current().task_done(**fields)
+
+def add_arguments(parser):
+    parser.add_argument("--stats", metavar="PATH",
+                        help="Append per-stage timings, byte/item counts and peak memory as JSON lines "
+                             "to PATH ('-' for stderr)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Run under cProfile and write the profile to PATH (view with python3 -m pstats)")
+
+@contextlib.contextmanager
+def session(tool, args):
+    """Set up --stats/--profile for one command-line run and write the summary at the end."""
+    global _current
+    path = getattr(args, 'stats', None)
+    if path and path != '-':
+        path = os.path.abspath(path)
+    _current = Stats(tool, path)
+    saved_env = {name: os.environ.get(name) for name in (STATS_ENV, TOOL_ENV)}
+    if path:
+        # Inherited by worker processes, whichever way they are started
+        os.environ[STATS_ENV] = path
+        os.environ[TOOL_ENV] = tool
+    profile_path = getattr(args, 'profile', None)
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield _current
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        _current.summary()
+        # A warm office_tools.py worker runs many sessions in one process
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        _current = None
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+One entry point for all the office tools: office_tools.py <command> [args...]
+
+Only the module behind the chosen command is imported, so `html2md` never
+pays for PyMuPDF or python-pptx. For shell loops that run thousands of small
+jobs, `serve` keeps one warm process around and takes jobs over stdin or a
+local socket, so Python and the libraries start up once:
+
+    python3 office_tools.py serve --socket /tmp/office-tools.sock &
+    for f in *.html; do
+        python3 office_tools.py send --socket /tmp/office-tools.sock html2md "$f"
+    done
+
+A job is one line: a JSON list (["html2md", "page.html"]), a JSON object
+({"argv": [...], "cwd": "/some/dir", "id": 7}) or plain shell words
+(html2md page.html). Each job gets one JSON line back with its id, exit
+code, run time and everything it printed.
+
+Standard library only; the tools import their own dependencies.
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import socket
+import argparse
+import importlib
+import tempfile
+import traceback
+
+# command -> (module, function taking an argv list)
+COMMANDS = {
+    'clean-html': ('clean_html', 'main'),
+    'html2md': ('html2md', 'main'),
+    'docx2md': ('docx2md', 'main'),
+    'pipeline': ('pipeline', 'main'),
+    'combine-by-toc': ('combine_by_toc', 'main'),
+    'combine-md': ('combine_md', 'main'),
+    'dedupe': ('deduplicate_md', 'cli'),
+    'section-index': ('section_index', 'main'),
+    'pdf-to-png': ('pdf_to_png_nomadmin', 'main'),
+    'extract-pages': ('extract_pages', 'main'),
+    'images-to-pptx': ('images_to_pptx', 'main'),
+    'pdf-to-pptx': ('pdf_to_pptx', 'main'),
+    'cache': ('convert_cache', 'main'),
+}
+ALIASES = {
+    'deduplicate-md': 'dedupe',
+    'pdf-to-png-nomadmin': 'pdf-to-png',
+}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def resolve(name):
+    """Map a command name (dashes or underscores, aliases allowed) to its COMMANDS key."""
+    name = name.replace('_', '-')
+    name = ALIASES.get(name, name)
+    return name if name in COMMANDS else None
+
+def run_command(argv):
+    """Run one tool in this process and return its exit code.
+
+    The tool's module is imported on first use and then stays loaded.
+    """
+    if not argv:
+        print("Error: no command given.", file=sys.stderr)
+        return 2
+    command = resolve(argv[0])
+    if command is None:
+        print(f"Error: unknown command {argv[0]!r} (see --help)", file=sys.stderr)
+        return 2
+    module_name, func_name = COMMANDS[command]
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    saved_argv0 = sys.argv[0]
+    # argparse takes the usage line's program name from sys.argv[0]
+    sys.argv[0] = f"office_tools.py {command}"
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+        func(list(argv[1:]))
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        raise
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        sys.argv[0] = saved_argv0
+
+def parse_job(line):
+    """Turn one request line into (id, argv, cwd)."""
+    line = line.strip()
+    if line.startswith(('[', '{')):
+        job = json.loads(line)
+        if isinstance(job, list):
+            return None, [str(a) for a in job], None
+        return job.get('id'), [str(a) for a in job.get('argv', [])], job.get('cwd')
+    return None, shlex.split(line), None
+
+def run_job(line):
+    """Run one request line with its output captured; returns the JSON reply as a dict."""
+    start = time.perf_counter()
+    try:
+        job_id, argv, cwd = parse_job(line)
+    except ValueError as e:
+        return {'id': None, 'exit': 2, 'seconds': 0.0, 'output': f"Error: bad job line: {e}\n"}
+
+    old_cwd = os.getcwd()
+    # Tools hand settings to their workers through the environment; keep one job's out of the next
+    old_env = dict(os.environ)
+    # Capture at the file-descriptor level so output from pool workers is kept too
+    with tempfile.TemporaryFile() as capture:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        os.dup2(capture.fileno(), 1)
+        os.dup2(capture.fileno(), 2)
+        try:
+            if cwd:
+                os.chdir(cwd)
+            code = run_command(argv)
+        except (OSError, KeyboardInterrupt) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+            os.chdir(old_cwd)
+            if os.environ != old_env:
+                os.environ.clear()
+                os.environ.update(old_env)
+        capture.seek(0)
+        output = capture.read().decode('utf-8', errors='replace')
+    return {'id': job_id, 'exit': code, 'seconds': round(time.perf_counter() - start, 4), 'output': output}
+
+def serve_stream(lines, reply):
+    """Answer each non-blank line of lines with one JSON line written to reply."""
+    for line in lines:
+        if not line.strip():
+            continue
+        reply.write(json.dumps(run_job(line)) + '\n')
+        reply.flush()
+
+def serve(socket_path=None, preload=()):
+    """Run jobs until stdin closes, or forever on a Unix socket if socket_path is given."""
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    for command in preload:
+        name = resolve(command)
+        if name is None:
+            print(f"Error: unknown command {command!r}", file=sys.stderr)
+            sys.exit(2)
+        importlib.import_module(COMMANDS[name][0])
+
+    if socket_path is None:
+        # Replies go to the original stdout; the tools' own output is captured per job
+        with os.fdopen(os.dup(1), 'w', encoding='utf-8') as reply:
+            serve_stream(sys.stdin, reply)
+        return
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+    # Let `kill` unwind through the finally below so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Serving on {socket_path} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        while True:
+            # One connection at a time: jobs change the working directory and redirect output
+            conn, _ = server.accept()
+            with conn, conn.makefile('r', encoding='utf-8') as lines, \
+                    conn.makefile('w', encoding='utf-8') as reply:
+                try:
+                    serve_stream(lines, reply)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+def send(socket_path, argv):
+    """Run one job on a serving worker, print its output and return its exit code."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError as e:
+        print(f"Error: cannot reach a worker on {socket_path}: {e}", file=sys.stderr)
+        return 1
+    with client, client.makefile('rw', encoding='utf-8') as stream:
+        stream.write(json.dumps({'argv': argv, 'cwd': os.getcwd()}) + '\n')
+        stream.flush()
+        client.shutdown(socket.SHUT_WR)
+        answer = stream.readline()
+    if not answer:
+        print("Error: the worker closed the connection without answering.", file=sys.stderr)
+        return 1
+    result = json.loads(answer)
+    sys.stdout.write(result['output'])
+    return result['exit']
+
+def print_help():
+    print(__doc__.strip().splitlines()[0])
+    print("\nCommands:")
+    for command, (module_name, _) in COMMANDS.items():
+        print(f"  {command:<16} {module_name}.py")
+    print("  serve            keep one process warm and run jobs from stdin or --socket PATH")
+    print("  send             run one job on a worker started with serve --socket PATH")
+    print("\nRun 'office_tools.py <command> --help' for a command's options.")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print_help()
+        return
+    if argv[0] == 'serve':
+        parser = argparse.ArgumentParser(prog="office_tools.py serve",
+                                         description="Run jobs in one warm process, one per line of input.")
+        parser.add_argument("--socket", metavar="PATH",
+                            help="Listen on this Unix socket instead of reading jobs from stdin")
+        parser.add_argument("--preload", nargs="+", default=[], metavar="COMMAND",
+                            help="Import these commands' modules up front")
+        args = parser.parse_args(argv[1:])
+        serve(args.socket, args.preload)
+        return
+    if argv[0] == 'send':
+        parser = argparse.ArgumentParser(prog="office_tools.py send",
+                                         description="Run one command on a worker started with serve --socket.")
+        parser.add_argument("--socket", metavar="PATH", required=True, help="The worker's socket")
+        parser.add_argument("job", nargs=argparse.REMAINDER, help="Command and its arguments")
+        args = parser.parse_args(argv[1:])
+        sys.exit(send(args.socket, args.job))
+    sys.exit(run_command(argv))
+
+if __name__ == '__main__':
+    main()
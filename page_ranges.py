@@ -0,0 +1,26 @@
+"""
+Page and frame range parsing shared by the PDF and image tools.
+
+Kept apart from the tools themselves so that importing it loads neither
+PyMuPDF nor Pillow.
+"""
+
+def parse_pages(spec, count, unit='page'):
+    """Turn a 1-based spec like "1-5,8,10-" into sorted 0-based page (or frame) numbers."""
+    if not spec:
+        return list(range(count))
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else count
+        else:
+            first = last = int(part)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid {unit} range: {part}")
+        pages.update(range(first - 1, min(last, count)))
+    return sorted(pages)
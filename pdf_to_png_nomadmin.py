@@ -1,30 +1,261 @@
 import sys
 import os
+import math
+import zlib
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fitz  # PyMuPDF
 
-if len(sys.argv) < 2:
-    print("Usage: python3 pdf_to_png_nomadmin.py <pdf_file>")
-    sys.exit(1)
+import instrument
+import convert_cache
+from page_ranges import parse_pages
 
-pdf_path = sys.argv[1]
+# Bump whenever rendering output changes so cached pages are redone
+CONVERTER_VERSION = 1
+FORMATS = {'png': 'png', 'jpeg': 'jpg', 'jpg': 'jpg', 'webp': 'webp'}
+DEFAULT_MAX_MEMORY_MB = 1024  # per worker; larger pages are rendered in strips
+TILE_SIZE = 254   # DeepZoom defaults
+TILE_OVERLAP = 1
 
-if not os.path.isfile(pdf_path):
-    print(f"File not found: {pdf_path}")
-    sys.exit(1)
+class PngStreamWriter:
+    """Write an 8-bit PNG a band of rows at a time, so the whole raster never sits in memory."""
 
-basename = os.path.splitext(os.path.basename(pdf_path))[0]
-output_folder = os.getcwd()
+    COLOR_TYPES = {1: 0, 3: 2, 4: 6}  # channels -> PNG colour type (grey, RGB, RGBA)
 
-doc = fitz.open(pdf_path)
+    def __init__(self, path, width, height, channels):
+        self.f = open(path, 'wb')
+        self.row_bytes = width * channels
+        self.rows_left = height
+        self.z = zlib.compressobj(6)
+        self.f.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, self.COLOR_TYPES[channels], 0, 0, 0))
 
-for page_num in range(len(doc)):
-    page = doc.load_page(page_num)
-    # Zoom factor to simulate ~300 DPI
-    zoom = 300 / 72  # default is 72 DPI
+    def _chunk(self, kind, data):
+        self.f.write(struct.pack('>I', len(data)) + kind + data)
+        self.f.write(struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write_rows(self, samples, stride, rows):
+        rows = min(rows, self.rows_left)
+        # Filter type 0 (None) before every scanline
+        band = b''.join(b'\x00' + bytes(samples[i * stride:i * stride + self.row_bytes]) for i in range(rows))
+        data = self.z.compress(band)
+        if data:
+            self._chunk(b'IDAT', data)
+        self.rows_left -= rows
+
+    def close(self):
+        if self.rows_left:
+            # Pad short renders with white so the image matches its header
+            self.write_rows(b'\xff' * self.row_bytes, 0, self.rows_left)
+        self._chunk(b'IDAT', self.z.flush())
+        self._chunk(b'IEND', b'')
+        self.f.close()
+
+def _save_pixmap(pix, out_path, ext, quality):
+    if ext == 'webp':
+        # MuPDF can't write WebP, so hand the raw samples to Pillow
+        from PIL import Image
+        mode = 'RGBA' if pix.alpha else ('L' if pix.n == 1 else 'RGB')
+        Image.frombytes(mode, (pix.width, pix.height), pix.samples).save(out_path, 'WEBP', quality=quality)
+    elif ext == 'jpg':
+        pix.save(out_path, jpg_quality=quality)
+    else:
+        pix.save(out_path)
+
+def render_in_strips(page, zoom, out_path, max_bytes):
+    """Render page to a PNG in full-width strips of at most max_bytes each."""
     mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat)
-    out_path = os.path.join(output_folder, f"{basename}_page_{page_num}.png")
-    pix.save(out_path)
-    print(f"Saved: {out_path}")
+    size = (page.rect * mat).irect
+    channels = 3
+    # Half the budget for the strip pixmap, half for the filtered copy handed to zlib
+    strip_rows = max(1, max_bytes // (2 * size.width * channels))
+    dl = page.get_displaylist()  # interpret the page once, rasterise it many times
+    writer = PngStreamWriter(out_path, size.width, size.height, channels)
+    try:
+        for y0 in range(0, size.height, strip_rows):
+            y1 = min(size.height, y0 + strip_rows)
+            clip = fitz.Rect(page.rect.x0, y0 / zoom, page.rect.x1, y1 / zoom)
+            pix = dl.get_pixmap(matrix=mat, clip=clip, alpha=False)
+            writer.write_rows(pix.samples_mv, pix.stride, min(pix.height, y1 - y0))
+            del pix
+    finally:
+        writer.close()
+
+def render_deepzoom(page, zoom, out_base, ext, quality):
+    """Render page as a DeepZoom (.dzi) tile pyramid, one tile in memory at a time."""
+    size = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    width, height = size.width, size.height
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    dl = page.get_displaylist()
+    for level in range(max_level + 1):
+        scale = 2 ** (max_level - level)
+        level_zoom = zoom / scale
+        level_w, level_h = math.ceil(width / scale), math.ceil(height / scale)
+        level_dir = os.path.join(f"{out_base}_files", str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        mat = fitz.Matrix(level_zoom, level_zoom)
+        for row in range(math.ceil(level_h / TILE_SIZE)):
+            for col in range(math.ceil(level_w / TILE_SIZE)):
+                x0 = max(0, col * TILE_SIZE - TILE_OVERLAP)
+                y0 = max(0, row * TILE_SIZE - TILE_OVERLAP)
+                x1 = min(level_w, (col + 1) * TILE_SIZE + TILE_OVERLAP)
+                y1 = min(level_h, (row + 1) * TILE_SIZE + TILE_OVERLAP)
+                clip = fitz.Rect(x0 / level_zoom, y0 / level_zoom, x1 / level_zoom, y1 / level_zoom)
+                pix = dl.get_pixmap(matrix=mat, clip=clip, alpha=False)
+                _save_pixmap(pix, os.path.join(level_dir, f"{col}_{row}.{ext}"), ext, quality)
+    with open(f"{out_base}.dzi", 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{TILE_SIZE}" '
+                f'Overlap="{TILE_OVERLAP}" Format="{ext}"><Size Width="{width}" Height="{height}"/></Image>\n')
+
+# Per-process state, set up once by _init_worker so every page reuses it
+_doc = None
+_mat = None
+_job = None
+
+def _init_worker(pdf_path, dpi, output_folder, basename, fmt, quality, max_mb=DEFAULT_MAX_MEMORY_MB,
+                 deepzoom=False, digest=None):
+    global _doc, _mat, _job
+    _doc = fitz.open(pdf_path)
+    zoom = dpi / 72  # default is 72 DPI
+    _mat = fitz.Matrix(zoom, zoom)
+    _job = (output_folder, basename, fmt, quality, max_mb * 1024 * 1024, deepzoom, digest)
+
+def _close_worker():
+    # The serial path runs in the caller's process, which may be a long-lived office_tools server
+    global _doc
+    if _doc is not None:
+        _doc.close()
+        _doc = None
+
+def _render_pages(page_nums):
+    output_folder, basename, fmt, quality, max_bytes, deepzoom, digest = _job
+    ext = FORMATS[fmt]
+    zoom = _mat.a
+    saved = []
+    for page_num in page_nums:
+        page = _doc.load_page(page_num)
+        out_base = os.path.join(output_folder, f"{basename}_page_{page_num}")
+        if deepzoom:
+            with instrument.stage('render'):
+                render_deepzoom(page, zoom, out_base, ext, quality)
+            saved.append(f"{out_base}.dzi")
+            instrument.count(items=1)
+            instrument.task_done(page=page_num + 1)
+            continue
+        size = (page.rect * _mat).irect
+        if size.width * size.height * 3 > max_bytes:
+            # Too big to hold at once: stream it out as PNG, whatever --format says
+            out_path = f"{out_base}.png"
+            with instrument.stage('render'):
+                render_in_strips(page, zoom, out_path, max_bytes)
+        else:
+            out_path = f"{out_base}.{ext}"
+            # Only whole-page images are cached; strips and tile pyramids are too big to be worth it
+            key = digest and convert_cache.key('pdf_to_png_nomadmin', CONVERTER_VERSION, digest, page=page_num,
+                                               zoom=zoom, ext=ext, quality=quality)
+            image = convert_cache.get(key) if key else None
+            if image is not None:
+                with instrument.stage('save'), open(out_path, 'wb') as f:
+                    f.write(image)
+            else:
+                with instrument.stage('render'):
+                    pix = page.get_pixmap(matrix=_mat)
+                with instrument.stage('save'):
+                    _save_pixmap(pix, out_path, ext, quality)
+                del pix
+                if key:
+                    with open(out_path, 'rb') as f:
+                        convert_cache.put(key, f.read())
+        saved.append(out_path)
+        instrument.count(bytes_written=os.path.getsize(out_path), items=1)
+        instrument.task_done(page=page_num + 1)
+    return saved
+
+def pdf_to_images(pdf_path, output_folder=None, pages=None, dpi=300, fmt='png', quality=90, workers=1,
+                  max_mb=DEFAULT_MAX_MEMORY_MB, deepzoom=False):
+    """Render the given pages (0-based, default all) of pdf_path to image files.
+
+    Pages are split into chunks that are handed to `workers` processes, each
+    of which opens its own copy of the document. Pages whose raster would
+    exceed max_mb are rendered in strips and streamed to PNG; with deepzoom
+    every page becomes a .dzi tile pyramid instead. Whole-page images of a
+    PDF rendered before with the same settings are copied from the shared
+    conversion cache (convert_cache.py). Returns the saved paths.
+    """
+    output_folder = output_folder or os.getcwd()
+    os.makedirs(output_folder, exist_ok=True)
+    basename = os.path.splitext(os.path.basename(pdf_path))[0]
+    if pages is None:
+        with fitz.open(pdf_path) as doc:
+            pages = list(range(len(doc)))
+
+    instrument.count(bytes_read=os.path.getsize(pdf_path))
+    # Hashed once here; workers key their cached pages on it
+    digest = convert_cache.file_digest(pdf_path) if convert_cache.enabled() else None
+    job = (pdf_path, dpi, output_folder, basename, fmt, quality, max_mb, deepzoom, digest)
+    if workers <= 1 or len(pages) <= 1:
+        _init_worker(*job)
+        try:
+            saved = _render_pages(pages)
+        finally:
+            _close_worker()
+        for out_path in saved:
+            print(f"Saved: {out_path}")
+        return saved
+
+    # Several small chunks per worker keeps cores busy when pages vary in cost
+    size = max(1, len(pages) // (workers * 4))
+    chunks = [pages[i:i + size] for i in range(0, len(pages), size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=job) as pool:
+        futures = [pool.submit(_render_pages, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for out_path in future.result():
+                print(f"Saved: {out_path}")
+        # Report in page order, whatever order the chunks finished in
+        saved = [out_path for future in futures for out_path in future.result()]
+    # Workers count in their own processes; total them up here too
+    instrument.count(items=len(saved), bytes_written=sum(os.path.getsize(p) for p in saved))
+    return saved
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert PDF pages to image files.")
+    parser.add_argument("pdf_file", help="PDF to convert")
+    parser.add_argument("-o", "--output-dir", help="Folder for the images (default: current folder)")
+    parser.add_argument("--pages", help="Pages to render, 1-based, e.g. '1-5,8,10-' (default: all)")
+    parser.add_argument("--dpi", type=int, default=300, help="Resolution in dots per inch (default: 300)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="png", help="Image format (default: png)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality, 1-100 (default: 90)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--max-memory", type=int, default=DEFAULT_MAX_MEMORY_MB, metavar="MB",
+                        help="Raster memory budget per worker; bigger pages are rendered in strips and "
+                             f"saved as PNG (default: {DEFAULT_MAX_MEMORY_MB})")
+    parser.add_argument("--deepzoom", action="store_true",
+                        help="Write each page as a DeepZoom (.dzi) tile pyramid for very large drawings")
+    convert_cache.add_arguments(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    convert_cache.configure(args)
+
+    pdf_path = args.pdf_file
+    if not os.path.isfile(pdf_path):
+        print(f"File not found: {pdf_path}")
+        sys.exit(1)
+
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    try:
+        pages = parse_pages(args.pages, page_count)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    with instrument.session('pdf_to_png_nomadmin', args):
+        pdf_to_images(pdf_path, args.output_dir, pages, args.dpi, args.format, args.quality, args.workers,
+                      args.max_memory, args.deepzoom)
+    print("Done.")
 
-print("Done.")
+if __name__ == '__main__':
+    main()
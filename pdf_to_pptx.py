@@ -0,0 +1,166 @@
+"""
+Turn a PDF straight into a PowerPoint deck, one titled slide per page.
+
+This replaces running pdf_to_png_nomadmin.py and then images_to_pptx.py.
+Each page is rendered at exactly the size it is shown on its slide (at
+--dpi), encoded as PNG (or JPEG) in memory and put on the slide from there,
+so no image files are written and no oversized images end up in the deck.
+Pages are rendered in parallel worker processes, a few at a time, and added
+in page order with the same title and fitting as images_to_pptx.py.
+
+    python3 pdf_to_pptx.py report.pdf report.pptx
+    python3 pdf_to_pptx.py report.pdf report.pptx --pages 1-10 --dpi 200 --format jpeg
+"""
+
+import io
+import os
+import sys
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+
+import instrument
+import convert_cache
+from images_to_pptx import EMU_PER_INCH, fit_image, new_presentation, add_titled_slide, place_image
+from page_ranges import parse_pages
+
+# Bump whenever rendering output changes so cached pages are redone
+CONVERTER_VERSION = 1
+FORMATS = ('png', 'jpeg')
+
+def slide_zoom(rect, dpi):
+    """The zoom that renders a page of this size at dpi once it is fitted to its slide."""
+    _, _, display_width, _ = fit_image(rect.width, rect.height)
+    return display_width / EMU_PER_INCH * dpi / rect.width
+
+# Per-process state, set up once by _init_worker so every page reuses it
+_doc = None
+_job = None
+
+def _init_worker(pdf_path, dpi, fmt, quality, digest=None):
+    global _doc, _job
+    _doc = fitz.open(pdf_path)
+    _job = (dpi, fmt, quality, digest)
+
+def _close_worker():
+    # The serial path runs in the caller's process, which may be a long-lived office_tools server
+    global _doc
+    if _doc is not None:
+        _doc.close()
+        _doc = None
+
+def render_page(page_num):
+    """Render one page at its on-slide size; returns (encoded image bytes, (width, height))."""
+    try:
+        return _render_page(page_num)
+    finally:
+        instrument.task_done(page=page_num + 1)
+
+def _render_page(page_num):
+    dpi, fmt, quality, digest = _job
+    page = _doc.load_page(page_num)
+    zoom = slide_zoom(page.rect, dpi)
+    mat = fitz.Matrix(zoom, zoom)
+    key = digest and convert_cache.key('pdf_to_pptx', CONVERTER_VERSION, digest, page=page_num, zoom=zoom,
+                                       fmt=fmt, quality=quality)
+    data = convert_cache.get(key) if key else None
+    if data is not None:
+        size = (page.rect * mat).irect
+        return data, (size.width, size.height)
+    with instrument.stage('render'):
+        pix = page.get_pixmap(matrix=mat, alpha=False)
+    with instrument.stage('encode'):
+        data = pix.tobytes('jpeg', jpg_quality=quality) if fmt == 'jpeg' else pix.tobytes('png')
+    if key:
+        convert_cache.put(key, data)
+    return data, (pix.width, pix.height)
+
+def rendered_pages(pdf_path, pages, dpi=150, fmt='png', quality=85, workers=1):
+    """Yield (page number, image bytes, (width, height)) for pages, in order.
+
+    With several workers at most 2 * workers pages are rendered or waiting
+    at once, so memory does not grow with the length of the document.
+    """
+    # Hashed once here; workers key their cached pages on it
+    digest = convert_cache.file_digest(pdf_path) if convert_cache.enabled() else None
+    job = (pdf_path, dpi, fmt, quality, digest)
+    if workers <= 1 or len(pages) <= 1:
+        _init_worker(*job)
+        try:
+            for page_num in pages:
+                yield (page_num,) + render_page(page_num)
+        finally:
+            _close_worker()
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=job) as pool:
+        queue = iter(pages)
+        pending = deque((page_num, pool.submit(render_page, page_num))
+                        for page_num in itertools.islice(queue, workers * 2))
+        while pending:
+            page_num, future = pending.popleft()
+            for next_page in itertools.islice(queue, 1):
+                pending.append((next_page, pool.submit(render_page, next_page)))
+            yield (page_num,) + future.result()
+
+def pdf_to_pptx(pdf_path, output_file, pages=None, dpi=150, fmt='png', quality=85, workers=1):
+    """Build a deck with one slide per page (0-based, default all) of pdf_path.
+
+    Slides are titled as the two-step route named its images
+    (<name>_page_<n>, counting from 0). Returns the number of slides.
+    """
+    basename = os.path.splitext(os.path.basename(pdf_path))[0]
+    if pages is None:
+        with fitz.open(pdf_path) as doc:
+            pages = list(range(len(doc)))
+    instrument.count(bytes_read=os.path.getsize(pdf_path))
+
+    prs = new_presentation()
+    for page_num, data, (width, height) in rendered_pages(pdf_path, pages, dpi, fmt, quality, workers):
+        slide = add_titled_slide(prs, f"{basename}_page_{page_num}")
+        place_image(slide, io.BytesIO(data), width, height)
+        instrument.count(items=1)
+    with instrument.stage('save'):
+        prs.save(output_file)
+    instrument.count(bytes_written=os.path.getsize(output_file))
+    print(f"{len(pages)} slides saved to: {output_file}")
+    return len(pages)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn a PDF into a PowerPoint deck, one slide per page.")
+    parser.add_argument("pdf_file", help="PDF to convert")
+    parser.add_argument("output_pptx", help="Presentation to write (.pptx)")
+    parser.add_argument("--pages", help="Pages to include, 1-based, e.g. '1-5,8,10-' (default: all)")
+    parser.add_argument("--dpi", type=int, default=150,
+                        help="Resolution of the page images as shown on the slide (default: 150)")
+    parser.add_argument("--format", choices=FORMATS, default="png",
+                        help="Page image encoding; png suits text and line art, jpeg is much smaller for "
+                             "scanned or photo pages (default: png)")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality, 1-100 (default: 85)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs)")
+    convert_cache.add_arguments(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    convert_cache.configure(args)
+
+    pdf_path = args.pdf_file
+    if not os.path.isfile(pdf_path):
+        print(f"File not found: {pdf_path}")
+        sys.exit(1)
+
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    try:
+        pages = parse_pages(args.pages, page_count)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    with instrument.session('pdf_to_pptx', args):
+        pdf_to_pptx(pdf_path, args.output_pptx, pages, args.dpi, args.format, args.quality, args.workers)
+
+if __name__ == "__main__":
+    main()
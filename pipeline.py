@@ -0,0 +1,152 @@
+import io
+import os
+import sys
+import time
+import zipfile
+import argparse
+import logging
+from bs4 import BeautifulSoup
+
+from clean_html import clean_soup, pick_parser, collect_inputs, run_bounded
+from html2md import html_to_markdown
+from docx2md import docx_to_markdown, read_mime_html, md_path_for
+from deduplicate_md import deduplicate
+import instrument
+import convert_cache
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+INPUT_EXTENSIONS = ('.docx', '.doc', '.html', '.htm')
+
+def document_to_markdown(path, data, parser_name='html.parser', clean=True):
+    """Convert the raw bytes of one Word or HTML document to Markdown.
+
+    .docx files stream straight from their XML; HTML and MIME (.doc) exports
+    are parsed once, and that same tree is cleaned and then converted.
+    """
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        zf = None
+    if zf is not None:
+        out = io.StringIO()
+        with instrument.stage('convert'), zf:
+            docx_to_markdown(zf, out)
+        return out.getvalue()
+
+    with instrument.stage('parse'):
+        if path.lower().endswith(('.html', '.htm')):
+            html = convert_cache.decode_text(data)
+        else:
+            # Only the HTML part of a MIME export is decoded, not its embedded images
+            html = read_mime_html(io.BytesIO(data))
+        if html is None:
+            raise ValueError("no HTML found (legacy binary .doc files are not supported)")
+        soup = BeautifulSoup(html, pick_parser(parser_name))
+    if clean:
+        with instrument.stage('clean'):
+            clean_soup(soup)
+    with instrument.stage('convert'):
+        return html_to_markdown(soup)
+
+def run_pipeline(path, output_folder=None, parser_name='html.parser', clean=True, dedupe=True, near=None):
+    """Take one document from file to deduplicated Markdown, entirely in memory.
+
+    The input is read once and the result written once; nothing in between
+    touches the disk. Returns (out_file, bytes_read, bytes_written, seconds).
+    """
+    start = time.perf_counter()
+    with instrument.stage('read'):
+        with open(path, 'rb') as f:
+            data = f.read()
+    markdown = document_to_markdown(path, data, parser_name, clean)
+    if dedupe:
+        with instrument.stage('dedupe'):
+            out = io.StringIO()
+            deduplicate(io.BytesIO(markdown.encode('utf-8')), out, near)
+            markdown = out.getvalue()
+
+    out_file = md_path_for(path, output_folder or os.path.dirname(path))
+    with instrument.stage('write'):
+        encoded = markdown.encode('utf-8')
+        with open(out_file, 'wb') as f:
+            f.write(encoded)
+    instrument.count(bytes_read=len(data), bytes_written=len(encoded), items=1)
+    instrument.task_done(file=path)
+    return out_file, len(data), len(encoded), time.perf_counter() - start
+
+def _pipeline_worker(path, options):
+    # Per-document INFO lines from clean_soup would interleave across processes
+    logging.getLogger().setLevel(logging.WARNING)
+    return run_pipeline(path, **options)
+
+def run_batch(files, workers=None, **options):
+    """Run many documents through the pipeline over a process pool.
+
+    At most 2 * workers documents are in flight at once. options are passed
+    on to run_pipeline. Returns the number of documents that failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    if options.get('output_folder'):
+        os.makedirs(options['output_folder'], exist_ok=True)
+    total_in = total_out = failed = 0
+    batch_start = time.perf_counter()
+
+    def report(path, future):
+        nonlocal total_in, total_out, failed
+        try:
+            out_file, size_in, size_out, seconds = future.result()
+        except Exception as e:
+            failed += 1
+            logging.error(f"Failed to convert {path}: {e}")
+            return
+        total_in += size_in
+        total_out += size_out
+        instrument.count(bytes_read=size_in, bytes_written=size_out, items=1)
+        logging.info(f"{path} -> {out_file} ({size_in / 1e6:.2f} MB in {seconds:.2f}s)")
+
+    run_bounded(_pipeline_worker, files, workers, report, options)
+
+    elapsed = time.perf_counter() - batch_start
+    converted = len(files) - failed
+    logging.info(
+        f"Converted {converted} documents, {failed} failed; {total_in / 1e6:.2f} MB in, "
+        f"{total_out / 1e6:.2f} MB of Markdown out in {elapsed:.2f}s "
+        f"({converted / elapsed if elapsed else 0.0:.1f} docs/s) with {workers} workers"
+    )
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Turn Word (.docx/.doc) and HTML exports into clean, deduplicated Markdown in one go.")
+    parser.add_argument("inputs", nargs="+", help="File(s), folder(s) or glob pattern(s) such as 'export/**/*.html'")
+    parser.add_argument("-o", "--output-dir", help="Where to write .md files (default: beside the originals)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--parser", default="html.parser", choices=["html.parser", "lxml", "auto"],
+                        help="BeautifulSoup parser backend for HTML (default: html.parser)")
+    parser.add_argument("--no-clean", action="store_true", help="Skip the clean_html step")
+    parser.add_argument("--no-dedupe", action="store_true", help="Skip the deduplicate_md step")
+    parser.add_argument("--near", type=float, metavar="JACCARD",
+                        help="Also merge near-duplicate sections at this similarity (see deduplicate_md.py)")
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.near is not None and not 0 < args.near <= 1:
+        parser.error("--near must be between 0 and 1")
+
+    files = collect_inputs(args.inputs, INPUT_EXTENSIONS, skip_cleaned=False)
+    if not files:
+        logging.error(f"No Word or HTML files found in: {' '.join(args.inputs)}")
+        sys.exit(1)
+    missing = [p for p in files if not os.path.exists(p)]
+    if missing:
+        logging.error(f"File does not exist: {missing[0]}")
+        sys.exit(1)
+
+    with instrument.session('pipeline', args):
+        if run_batch(files, args.workers, output_folder=args.output_dir, parser_name=args.parser,
+                     clean=not args.no_clean, dedupe=not args.no_dedupe, near=args.near):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+A persistent index of the sections in a folder of Markdown files, for
+finding duplicates across files without combining them first.
+
+Files are split into sections exactly as deduplicate_md.py splits one file:
+each heading (any level) with the content up to the next heading, compared
+by a digest of the normalized heading and content. For every section the
+index keeps the heading, that digest, and the file, byte offset and line it
+starts at. It lives in <folder>/.section-index.sqlite.
+
+Updating is incremental: only files whose size or modification time changed
+are split again, in parallel, and deleted files are dropped. The extension
+the index was built for is stored with it, so a later --ext that differs is
+refused instead of dropping every file indexed so far. Looking up
+where else a section appears is a single indexed lookup by digest, however
+many pages the folder holds.
+
+    python3 section_index.py update pages/
+    python3 section_index.py report pages/            # every section found in more than one place
+    python3 section_index.py where pages/ intro.md    # where else each section of intro.md appears
+
+Standard library only, plus deduplicate_md.py, combine_md.py and
+instrument.py from this folder.
+"""
+
+import io
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import itertools
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import instrument
+from combine_md import find_files
+from deduplicate_md import scan_sections
+
+INDEX_FILE = '.section-index.sqlite'
+# Bump whenever splitting or digests change so every file is indexed again
+INDEX_VERSION = 1
+
+# The lookup behind "where else": one indexed probe per section
+DIGEST_INDEX = 'CREATE INDEX IF NOT EXISTS sections_digest ON sections (digest)'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sections INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS sections (
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    digest BLOB NOT NULL,
+    start INTEGER NOT NULL,
+    heading_end INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    heading TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sections_file ON sections (file_id);
+""" + DIGEST_INDEX
+
+def split_file(path):
+    """Split one Markdown file into sections.
+
+    Returns (rows, error): one (digest, start, heading_end, end, line,
+    heading) row per section, or no rows and a message if the file cannot
+    be read as UTF-8.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        starts, heading_ends, digests, size, _ = scan_sections(io.BytesIO(data))
+    except (OSError, UnicodeDecodeError) as e:
+        return [], str(e)
+    rows = []
+    line, counted = 1, 0
+    ends = list(starts[1:]) + [size]
+    for idx, (start, heading_end, end) in enumerate(zip(starts, heading_ends, ends)):
+        line += data.count(b'\n', counted, start)
+        counted = start
+        heading = data[start:heading_end].decode('utf-8').strip()
+        rows.append((bytes(digests[idx * 16:(idx + 1) * 16]), start, heading_end, end, line, heading))
+    instrument.count(bytes_read=len(data), items=1)
+    return rows, None
+
+def _split_job(job):
+    rel, path, size, mtime_ns = job
+    rows, error = split_file(path)
+    return rel, size, mtime_ns, rows, error
+
+class SectionIndex:
+    """The section index of one folder, kept in a SQLite file."""
+
+    def __init__(self, folder, index_path=None):
+        self.folder = Path(folder)
+        self.db = sqlite3.connect(index_path or self.folder / INDEX_FILE)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != INDEX_VERSION:
+            with self.db:
+                self.db.execute('DELETE FROM sections')
+                self.db.execute('DELETE FROM files')
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (INDEX_VERSION,))
+
+    def close(self):
+        self.db.close()
+
+    def extension(self):
+        """The file extension this index covers, or None if it was never updated."""
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'ext'").fetchone()
+        return row[0] if row else None
+
+    def update(self, workers=None, ext=None):
+        """Bring the index up to date with the folder; returns counts of what changed.
+
+        ext defaults to the extension the index was built for (.md for a new
+        index). A different one raises ValueError: files with the old
+        extension would otherwise all be dropped as deleted.
+        """
+        indexed = self.extension()
+        if ext is None:
+            ext = indexed or '.md'
+        elif indexed is not None and ext != indexed:
+            raise ValueError(f"{self.folder} is indexed for {indexed} files, not {ext}; use --ext {indexed}, "
+                             f"or --index to keep a separate index for {ext} files")
+        with instrument.stage('walk'):
+            found = {}
+            folder = str(self.folder)
+            for rel in find_files(self.folder, ext, recursive=True):
+                st = os.stat(os.path.join(folder, rel))
+                found[rel.replace(os.sep, '/')] = (st.st_size, st.st_mtime_ns)
+        known = {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns in
+                 self.db.execute('SELECT id, path, size, mtime_ns FROM files')}
+
+        removed = [known[path][0] for path in known.keys() - found.keys()]
+        jobs = [(rel, os.path.join(folder, rel), size, mtime_ns) for rel, (size, mtime_ns) in sorted(found.items())
+                if known.get(rel, (None,))[1:] != (size, mtime_ns)]
+        changed = sum(rel in known for rel, _, _, _ in jobs)
+        failed = 0
+
+        workers = workers or os.cpu_count() or 1
+        # Filling a large index row by row costs more than building it once at the end
+        bulk = len(jobs) > max(len(known) // 2, 1000)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('ext', ?)", (ext,))
+            self._drop(removed)
+            if bulk:
+                self.db.execute('DROP INDEX IF EXISTS sections_digest')
+            if workers > 1 and len(jobs) > 1:
+                pool = ProcessPoolExecutor(max_workers=workers)
+                results = pool.map(_split_job, jobs, chunksize=64)
+            else:
+                pool = None
+                results = map(_split_job, jobs)
+            try:
+                for rel, size, mtime_ns, rows, error in results:
+                    if error:
+                        failed += 1
+                        print(f"Skipped {rel}: {error}", file=sys.stderr)
+                    elif pool:
+                        # Workers count in their own processes; total them up here too
+                        instrument.count(bytes_read=size, items=1)
+                    with instrument.stage('store'):
+                        self._store(rel, size, mtime_ns, rows, error)
+            finally:
+                if pool:
+                    pool.shutdown()
+            with instrument.stage('store'):
+                self.db.execute(DIGEST_INDEX)
+        total = self.db.execute('SELECT COUNT(*) FROM sections').fetchone()[0]
+        return {'files': len(found), 'added': len(jobs) - changed, 'changed': changed, 'removed': len(removed),
+                'failed': failed, 'sections': total}
+
+    def _drop(self, file_ids):
+        for chunk in _chunks(file_ids, 500):
+            marks = ','.join('?' * len(chunk))
+            self.db.execute(f'DELETE FROM sections WHERE file_id IN ({marks})', chunk)
+            self.db.execute(f'DELETE FROM files WHERE id IN ({marks})', chunk)
+
+    def _store(self, rel, size, mtime_ns, rows, error):
+        row = self.db.execute('SELECT id FROM files WHERE path = ?', (rel,)).fetchone()
+        if row:
+            file_id = row[0]
+            self.db.execute('DELETE FROM sections WHERE file_id = ?', (file_id,))
+            self.db.execute('UPDATE files SET size = ?, mtime_ns = ?, sections = ?, error = ? WHERE id = ?',
+                            (size, mtime_ns, len(rows), error, file_id))
+        else:
+            file_id = self.db.execute('INSERT INTO files (path, size, mtime_ns, sections, error) '
+                                      'VALUES (?, ?, ?, ?, ?)', (rel, size, mtime_ns, len(rows), error)).lastrowid
+        self.db.executemany('INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            [(file_id,) + row for row in rows])
+
+    def sections_of(self, rel):
+        """The sections of one file, in order: (digest, line, heading) rows."""
+        return self.db.execute('SELECT s.digest, s.line, s.heading FROM sections s JOIN files f ON f.id = s.file_id '
+                               'WHERE f.path = ? ORDER BY s.start', (rel,)).fetchall()
+
+    def where(self, digest):
+        """Every place a section with this digest appears: (path, line, heading) rows."""
+        return self.db.execute('SELECT f.path, s.line, s.heading FROM sections s JOIN files f ON f.id = s.file_id '
+                               'WHERE s.digest = ? ORDER BY f.path, s.start', (digest,)).fetchall()
+
+    def duplicates(self, min_copies=2):
+        """Yield (digest, [(path, line, heading), ...]) for each section found at least min_copies times."""
+        rows = self.db.execute(
+            'SELECT s.digest, f.path, s.line, s.heading FROM sections s JOIN files f ON f.id = s.file_id '
+            'WHERE s.digest IN (SELECT digest FROM sections GROUP BY digest HAVING COUNT(*) >= ?) '
+            'ORDER BY s.digest, f.path, s.start', (min_copies,))
+        for digest, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield digest, [row[1:] for row in group]
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def print_update(counts):
+    print(f"Indexed {counts['files']} files ({counts['added']} new, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['failed']} unreadable): {counts['sections']} sections")
+
+def report(index, min_copies, as_json):
+    groups = sorted(index.duplicates(min_copies), key=lambda group: (-len(group[1]), group[1][0]))
+    if as_json:
+        json.dump([{'digest': digest.hex(), 'heading': places[0][2], 'copies': len(places),
+                    'places': [{'file': path, 'line': line} for path, line, _ in places]}
+                   for digest, places in groups], sys.stdout, indent=2)
+        print()
+        return
+    if not groups:
+        print("No section appears more than once.")
+        return
+    for digest, places in groups:
+        print(f"{places[0][2]}  ({len(places)} copies)")
+        for path, line, _ in places:
+            print(f"    {path}:{line}")
+    extra = sum(len(places) - 1 for _, places in groups)
+    print(f"\n{len(groups)} sections appear more than once; {extra} copies could be removed")
+
+def where(index, rel, as_json):
+    results = []
+    for digest, line, heading in index.sections_of(rel):
+        others = [(path, other_line) for path, other_line, _ in index.where(digest)
+                  if (path, other_line) != (rel, line)]
+        results.append({'line': line, 'heading': heading, 'also_in': [{'file': p, 'line': n} for p, n in others]})
+    if as_json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    for result in results:
+        if result['also_in']:
+            print(f"{rel}:{result['line']} {result['heading']}")
+            for other in result['also_in']:
+                print(f"    also in {other['file']}:{other['line']}")
+    shared = sum(bool(result['also_in']) for result in results)
+    print(f"{shared} of {len(results)} sections in {rel} also appear elsewhere")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index the sections of a folder of Markdown files and find "
+                                                 "sections that appear in more than one place.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update_cmd = commands.add_parser("update", help="Create or refresh the index")
+    report_cmd = commands.add_parser("report", help="List every section found more than once")
+    report_cmd.add_argument("--min-copies", type=int, default=2,
+                            help="Only list sections found at least this many times (default: 2)")
+    where_cmd = commands.add_parser("where", help="Show where else the sections of one file appear")
+    for cmd in (update_cmd, report_cmd, where_cmd):
+        cmd.add_argument("folder", type=Path, help="Folder of Markdown files (searched recursively)")
+    where_cmd.add_argument("file", help="A Markdown file in the folder")
+    for cmd in (update_cmd, report_cmd, where_cmd):
+        cmd.add_argument("--index", type=Path, help=f"Index file (default: <folder>/{INDEX_FILE})")
+        cmd.add_argument("-j", "--workers", type=int, default=None,
+                         help="Worker processes for splitting changed files (default: number of CPUs)")
+        cmd.add_argument("--ext", help="File extension to index; kept with the index, so only needed "
+                                       "the first time (default: .md)")
+        instrument.add_arguments(cmd)
+    for cmd in (report_cmd, where_cmd):
+        cmd.add_argument("--no-update", action="store_true", help="Answer from the index as it is, without "
+                                                                  "checking the folder for changes first")
+        cmd.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.folder.is_dir():
+        sys.exit(f"Not a folder: {args.folder}")
+    with instrument.session("section_index", args):
+        index = SectionIndex(args.folder, args.index)
+        try:
+            if args.command == "update" or not args.no_update:
+                try:
+                    counts = index.update(args.workers, args.ext)
+                except ValueError as e:
+                    sys.exit(str(e))
+                if args.command == "update":
+                    print_update(counts)
+            if args.command == "report":
+                report(index, args.min_copies, args.json)
+            elif args.command == "where":
+                rel = Path(args.file)
+                if rel.is_absolute() or not (args.folder / rel).exists():
+                    # Accept a path as typed in the shell as well as one relative to the folder
+                    rel = Path(os.path.relpath(Path(args.file).resolve(), args.folder.resolve()))
+                where(index, rel.as_posix(), args.json)
+        finally:
+            index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+import clean_html
+
+SAMPLES = [
+    '<p class="a" id="b" style="color:red">Hello <span>world</span></p>',
+    '<div data-x="1" aria-label="x" data-y="2"><svg><g><path d="M0"/></g></svg>text</div>',
+    '<span><span class="c">nested <b>bold</b></span> tail</span>',
+    '<ul><li id="i"><span>one</span></li><li><svg class="s"><span>gone</span></svg>two</li></ul>',
+    '<p>unclosed <span>span <i>italic</p><div>after</div>',
+    '<table><tr><td aria-hidden="true"><span data-v="1">cell</span></td></tr></table>',
+    '<!DOCTYPE html><html><head><title>t</title><style>.a{}</style></head>'
+    '<body class="b"><!-- c --><span>x</span><script>var s = "<span>";</script></body></html>',
+    '<p>text only, no tags to clean</p>',
+    '',
+]
+
+def old_clean(soup):
+    """The seven passes clean_html.py ran before clean_soup existed."""
+    clean_html.remove_inline_svgs(soup)
+    clean_html.remove_classnames(soup)
+    clean_html.remove_ids(soup)
+    clean_html.remove_data_tags(soup)
+    clean_html.remove_aria_tags(soup)
+    clean_html.remove_style_tags(soup)
+    clean_html.unwrap_spans(soup)
+
+def random_html(rng, depth=0):
+    tags = ['div', 'p', 'span', 'span', 'b', 'svg', 'a', 'li', 'ul', 'td', 'br', 'img']
+    attrs = ['class="x"', 'id="y"', 'style="s"', 'data-k="v"', 'aria-label="l"', 'href="#"', 'title="t"']
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        if depth > 4 or rng.random() < 0.3:
+            parts.append(rng.choice(['text', ' ', 'a &amp; b', '<!-- c -->', '</span>', '<p>']))
+            continue
+        tag = rng.choice(tags)
+        attr = ' '.join(rng.sample(attrs, rng.randint(0, 3)))
+        inner = random_html(rng, depth + 1)
+        # Leave some tags unclosed so the parser has to repair the nesting
+        close = f'</{tag}>' if rng.random() < 0.85 else ''
+        parts.append(f'<{tag} {attr}>{inner}{close}')
+    return ''.join(parts)
+
+CORPUS = SAMPLES + [random_html(random.Random(seed)) for seed in range(300)]
+
+@pytest.mark.parametrize('parser', ['html.parser', 'lxml'])
+def test_clean_soup_matches_separate_passes(parser):
+    if parser == 'lxml':
+        pytest.importorskip('lxml')
+    for html in CORPUS:
+        expected = BeautifulSoup(html, parser)
+        old_clean(expected)
+        actual = BeautifulSoup(html, parser)
+        clean_html.clean_soup(actual)
+        assert str(actual) == str(expected), html
@@ -0,0 +1,64 @@
+import io
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+import html2md
+
+SAMPLES = [
+    '<p>a<br>b</br>c</p>',
+    '<p>x<img src="i.png">y</img>z<br/>w</p>',
+    '<ul><li>one<ul><li>two</li></ul>after</li><li>three</li></ul>',
+    '<ol><li>a<li>b</ol><p>unclosed <b>bold<p>next',
+    '<div><p>stray</span> end</i> tags</div></p>',
+    '<table><tr><td>1<td>2</tr><tr><th>x</th></table>',
+    '<pre>  keep\n  this</pre><blockquote><p>q1</p><p>q2</p></blockquote>',
+    '<p>&amp; &lt;x&gt; &nbsp; &foo; &#65; &#x42; &copy &#0; &</p>',
+    '<p>&#128; &#x81; &#150; &#x9F; &#1; &#127; &#xFDD0; &#xFFFE; &#55296; &#x110000; &#99999999; &#65abc &#x41zz</p>',
+    '<script>var s = "<p>no</p>";</script><!-- c --><![CDATA[cdata]]><h2>title</h2>',
+    '',
+]
+
+TAGS = ['p', 'div', 'ul', 'ol', 'li', 'b', 'i', 'span', 'br', 'img', 'hr', 'h2', 'pre', 'table', 'tr', 'td',
+        'th', 'blockquote', 'dl', 'dt', 'dd', 'script', 'a', 'input']
+TEXT = ['a', 'b c', ' ', '\n', '  x  ', '&amp;', '&lt;y&gt;', '&nbsp;', '&foo;', '&#65;', '&#x42;', '&copy',
+        '<!-- c -->', '<![CDATA[z]]>', 'q\n  r', '&']
+
+def random_html(rng):
+    """Tags opened, closed and self-closed at random, so most documents nest badly."""
+    parts = []
+    for _ in range(rng.randint(1, 60)):
+        r = rng.random()
+        tag = rng.choice(TAGS)
+        if r < 0.35:
+            parts.append(f'<{tag}>')
+        elif r < 0.6:
+            parts.append(f'</{tag}>')
+        elif r < 0.65:
+            parts.append(f'<{tag}/>')
+        else:
+            parts.append(rng.choice(TEXT))
+    return ''.join(parts)
+
+CORPUS = SAMPLES + [random_html(random.Random(seed)) for seed in range(1000)]
+
+def stream(html, chunk_size):
+    out = []
+    html2md.stream_html_to_markdown(io.StringIO(html), out.append, chunk_size)
+    return ''.join(out)
+
+@pytest.mark.parametrize('chunk_size', [html2md.CHUNK_SIZE, 7, 1])
+def test_stream_matches_tree(chunk_size):
+    for html in CORPUS:
+        expected = html2md.html_to_markdown(BeautifulSoup(html, 'html.parser'))
+        assert stream(html, chunk_size) == expected, html
+
+def test_stream_many_unclosed_voids():
+    # Every <br> and <img> waits for an end tag that never comes. BeautifulSoup itself is slow on
+    # this, so tree mode is checked on a few paragraphs and stream mode on many
+    unit = '<p>line<br>more<img></p>'
+    few = html2md.html_to_markdown(BeautifulSoup(unit * 3 + '<p>a<br>b</br>c</p>', 'html.parser'))
+    assert few == 'line more\n\n' * 3 + 'a bc\n'
+    assert stream(unit * 3 + '<p>a<br>b</br>c</p>', html2md.CHUNK_SIZE) == few
+    assert stream(unit * 40000 + '<p>a<br>b</br>c</p>', html2md.CHUNK_SIZE) == 'line more\n\n' * 40000 + 'a bc\n'